@@ -11,4 +11,53 @@ class Config:
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 
+    # Chatbot: concurrent Gemini calls (extra chats wait up to GEMINI_QUEUE_TIMEOUT s, then get a canned answer)
+    GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+    GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "10"))
+    CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "256"))      # cached question → answer pairs (0 = off)
+    CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "3600"))     # seconds
+
+    # Face detectors, cheapest first; later ones only re-check faces the earlier ones are unsure of
+    # ("opencv,retinaface" or with minimum confidences "opencv:6,retinaface:0.9"). Shared by live
+    # scans, report ingestion and re-embedding; changing it re-embeds all cases in the background.
+    DETECTOR_CASCADE = os.getenv("DETECTOR_CASCADE", os.getenv("DEEPFACE_DETECTOR", "opencv"))
+
+    # Preload DeepFace + detector in the background at startup; /health/ready reports 503 until warm
+    PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "false").lower() in ("1", "true", "yes")
+
+    # Live-scan uploads negotiated with the dashboard (GET /officer/scan-config): longest frame side
+    # sent, JPEG quality (0-1), and whether the browser may send only the face region it pre-detected
+    SCAN_MAX_SIDE = int(os.getenv("SCAN_MAX_SIDE", "640"))
+    SCAN_JPEG_QUALITY = float(os.getenv("SCAN_JPEG_QUALITY", "0.7"))
+    SCAN_ROI = os.getenv("SCAN_ROI", "true").lower() in ("1", "true", "yes")
+
+    # Threads running live-scan inference (detection + ArcFace); extra scans wait their turn
+    INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "2"))
+
+    # Scans per second shared by all ingested cameras (registered with a source); busy cameras get more
+    CAMERA_SCAN_BUDGET = float(os.getenv("CAMERA_SCAN_BUDGET", "4"))
+
+    # Worker processes (each with ArcFace preloaded) that embed newly reported photos
+    EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))
+    # Most embedding jobs waiting or running; new reports are turned away (503) beyond it. 0 = unbounded
+    EMBEDDING_QUEUE_MAX = int(os.getenv("EMBEDDING_QUEUE_MAX", "500"))
+
+    # Worker processes re-embedding cases in the background after a model/detector change (0 = off)
+    ROLLOVER_WORKERS = int(os.getenv("ROLLOVER_WORKERS", "1"))
+
+    # Photo embeddings cached by content hash (duplicate uploads / unchanged files skip inference); 0 = off
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "100000"))   # rows, ~2 KB each
+
+    # Case-embedding search: "exact" (brute force) or "ivf" (approximate, for very large DBs)
+    EMBEDDING_INDEX_BACKEND = os.getenv("EMBEDDING_INDEX_BACKEND", "exact")
+    IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))     # 0 = pick ~sqrt(N) lists when training
+    IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))   # lists scanned per query; higher = better recall, slower
+
+    # WhatsApp alert outbox: sender threads, global send rate and duplicate-suppression windows (seconds)
+    ALERT_SENDERS = int(os.getenv("ALERT_SENDERS", "2"))
+    ALERT_RATE_PER_SEC = float(os.getenv("ALERT_RATE_PER_SEC", "1"))   # Twilio's default per-sender limit
+    ALERT_BURST = int(os.getenv("ALERT_BURST", "5"))
+    ALERT_CASE_WINDOW = float(os.getenv("ALERT_CASE_WINDOW", "600"))   # one sighting alert per case per 10 min
+    ALERT_PHONE_WINDOW = float(os.getenv("ALERT_PHONE_WINDOW", "60"))
+
 config = Config()
@@ -16,11 +16,20 @@ from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
 
 from app.models.database import init_db
+from app.services.embedding_index import get_embedding_index
+from app.services.embedding_queue import embedding_queue
+from app.services.embedding_rollover import embedding_rollover
+from app.services.alert_dispatcher import alert_dispatcher
+from app.services.camera_ingest import camera_ingest
+from app.services.gemini_service import chat_service
+from app.services.executors import shutdown_stages
 from app.routes.landing import router as landing_router
 from app.routes.report import router as report_router
 from app.routes.officer import router as officer_router
 from app.routes.comments import router as comments_router
 from app.routes.chat import router as chat_router
+from app.routes.health import router as health_router
+from app.routes.cameras import router as cameras_router
 from app.config import config
 
 import sys
@@ -50,6 +59,25 @@ app.mount("/uploads", StaticFiles(directory=upload_dir), name="uploads")
 async def startup():
     os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
     init_db()
+    get_embedding_index()
+    embedding_queue.start()
+    embedding_rollover.start()
+    alert_dispatcher.start()
+    camera_ingest.start()
+    await chat_service.start()
+    if config.PRELOAD_MODELS:
+        from app.services.face_recognition_service import start_warm_up
+        start_warm_up()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    camera_ingest.stop()
+    embedding_queue.stop()
+    embedding_rollover.stop()
+    alert_dispatcher.stop()
+    await chat_service.close()
+    shutdown_stages()
 
 # ── Routers ───────────────────────────────────────────────────────────────────
 app.include_router(landing_router)
@@ -57,3 +85,5 @@ app.include_router(report_router)
 app.include_router(officer_router)
 app.include_router(comments_router)
 app.include_router(chat_router)
+app.include_router(health_router)
+app.include_router(cameras_router)
@@ -1,15 +1,102 @@
 import sqlite3
+import json
 import os
+import threading
+import numpy as np
 
 DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'database.db')
 
+# Embeddings are stored as raw little-endian float32 BLOBs (2 KB for ArcFace-512
+# instead of ~11 KB of JSON text) alongside their dimension and model tag.
+EMBEDDING_DTYPE = np.dtype("<f4")
+LEGACY_EMBEDDING_MODEL   = "ArcFace"                  # every JSON-era embedding came from ArcFace
+LEGACY_EMBEDDING_VERSION = "ArcFace/opencv/align=1"   # ...with the default detector, before version tags
 
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+
+# ── Connection pool ───────────────────────────────────────────────────────────
+# Each thread keeps a few open connections (per DB path) instead of opening a
+# new one per query. WAL lets the embedding/alert writers and the scan/dashboard
+# readers run concurrently; synchronous=NORMAL is durable across app crashes in
+# WAL mode and skips an fsync per commit.
+BUSY_TIMEOUT_MS     = 5000                 # wait for a competing writer instead of "database is locked"
+MMAP_SIZE           = 256 * 1024 * 1024    # bytes of the DB file read through mmap
+CACHE_SIZE_KB       = 16 * 1024            # page cache per connection
+STATEMENT_CACHE     = 256                  # prepared statements kept per connection
+MAX_IDLE_PER_THREAD = 4                    # extra connections (nested use) are closed on release
+
+_local = threading.local()
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=STATEMENT_CACHE)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
     return conn
 
 
+class PooledConnection:
+    """
+    sqlite3.Connection stand-in handed out by get_connection(). close()
+    rolls back anything uncommitted (same outcome as closing a real
+    connection) and returns the connection to the thread's idle list, so
+    the next get_connection() reuses it along with its statement cache.
+    """
+
+    __slots__ = ("_conn", "_path")
+
+    def __init__(self, conn: sqlite3.Connection, path: str):
+        self._conn = conn
+        self._path = path
+
+    def __getattr__(self, name):
+        conn = self._conn
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        if name in PooledConnection.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            conn.close()
+            return
+        idle = _local.__dict__.setdefault("idle", {}).setdefault(self._path, [])
+        if len(idle) < MAX_IDLE_PER_THREAD:
+            idle.append(conn)
+        else:
+            conn.close()
+
+
+def get_connection():
+    path = DB_PATH
+    idle = _local.__dict__.setdefault("idle", {}).get(path)
+    conn = idle.pop() if idle else _open_connection(path)
+    return PooledConnection(conn, path)
+
+
 def init_db():
     conn = get_connection()
     cursor = conn.cursor()
@@ -31,7 +118,12 @@ def init_db():
 
             -- Image
             image_path TEXT NOT NULL,
-            embedding TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            embedding_dim INTEGER,
+            embedding_model TEXT,
+            embedding_version TEXT,
+            image_hash TEXT,                    -- sha256 of the photo; spots re-uploaded photos
+            duplicate_of INTEGER,               -- earliest case with the same photo
 
             -- Complainant Details
             complainant_name TEXT NOT NULL,
@@ -45,6 +137,13 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
 
+        -- Dashboard listing: keyset pagination on (created_at, id), optionally filtered
+        CREATE INDEX IF NOT EXISTS idx_cases_created_at ON cases (created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_cases_status     ON cases (status, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_cases_state      ON cases (missing_state COLLATE NOCASE, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_cases_city       ON cases (missing_state COLLATE NOCASE, missing_city COLLATE NOCASE, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_cases_pin_code   ON cases (pin_code, created_at, id);
+
         CREATE TABLE IF NOT EXISTS comments (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             case_id INTEGER,
@@ -53,7 +152,129 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY(case_id) REFERENCES cases(id)
         );
+
+        -- Durable queue for background embedding extraction (see embedding_queue.py)
+        CREATE TABLE IF NOT EXISTS embedding_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            case_id INTEGER NOT NULL,
+            image_path TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',      -- pending | running | failed
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at REAL DEFAULT 0,     -- unix time; retry backoff
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- Embeddings for the next model/detector version, built in the background
+        -- while scans keep using the current ones (see embedding_rollover.py)
+        CREATE TABLE IF NOT EXISTS embedding_staging (
+            case_id INTEGER PRIMARY KEY,
+            embedding_version TEXT NOT NULL,
+            embedding BLOB,                     -- NULL: photo could not be embedded
+            embedding_dim INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- Photo embeddings by content hash + version, LRU-bounded (see embedding_cache.py)
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            image_hash TEXT NOT NULL,
+            embedding_version TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            embedding_dim INTEGER NOT NULL,
+            last_used REAL NOT NULL,            -- unix time; least recently used rows go first
+            PRIMARY KEY (image_hash, embedding_version)
+        );
+        CREATE INDEX IF NOT EXISTS idx_embedding_cache_lru ON embedding_cache (last_used);
+
+        CREATE TABLE IF NOT EXISTS alert_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,                 -- match | report_confirmation
+            case_id INTEGER,
+            to_number TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',      -- pending | sending | sent | failed
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            sid TEXT,
+            next_attempt_at REAL DEFAULT 0,     -- unix time; retry backoff
+            created_at REAL NOT NULL,           -- unix time; dedup windows
+            sent_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_alert_outbox_due   ON alert_outbox (status, next_attempt_at);
+        CREATE INDEX IF NOT EXISTS idx_alert_outbox_case  ON alert_outbox (kind, case_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_alert_outbox_phone ON alert_outbox (kind, to_number, created_at);
+
+        CREATE TABLE IF NOT EXISTS cameras (
+            id TEXT PRIMARY KEY,                -- camera_id used by scans, face tracks and metrics
+            name TEXT,
+            location TEXT NOT NULL,             -- quoted in match alerts
+            source TEXT,                        -- rtsp:// URL or video file pulled by camera_ingest; NULL = client pushes frames
+            enabled INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        -- The dashboard webcam, at the location scans used to hard-code
+        INSERT OR IGNORE INTO cameras (id, name, location)
+        VALUES ('officer-dashboard', 'Officer dashboard webcam', 'Main Terminal - Gate 4 (CCTV-08)');
     """)
 
     conn.commit()
+    _migrate_embeddings_to_blob(conn)
     conn.close()
+
+
+def encode_embedding(embedding) -> bytes:
+    """Pack an embedding (list or array) into the float32 BLOB format."""
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPE).ravel().tobytes()
+
+
+def decode_embedding(blob) -> np.ndarray:
+    """Zero-copy view of a stored embedding BLOB as a float32 vector."""
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+
+
+def _migrate_embeddings_to_blob(conn):
+    """
+    One-off, in-place upgrade of databases created before embeddings were
+    stored as BLOBs: adds the dim/model/version/hash columns and re-encodes JSON rows.
+    """
+    cursor = conn.cursor()
+    columns = {row["name"] for row in cursor.execute("PRAGMA table_info(cases)")}
+    if "embedding_dim" not in columns:
+        cursor.execute("ALTER TABLE cases ADD COLUMN embedding_dim INTEGER")
+    if "embedding_model" not in columns:
+        cursor.execute("ALTER TABLE cases ADD COLUMN embedding_model TEXT")
+    if "embedding_version" not in columns:
+        # model/detector/alignment tag; rows embedded before versioning get the legacy tag below
+        cursor.execute("ALTER TABLE cases ADD COLUMN embedding_version TEXT")
+    if "image_hash" not in columns:
+        # filled in for older photos the next time they are re-embedded
+        cursor.execute("ALTER TABLE cases ADD COLUMN image_hash TEXT")
+        cursor.execute("ALTER TABLE cases ADD COLUMN duplicate_of INTEGER")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_image_hash ON cases (image_hash)")
+
+    rows = cursor.execute(
+        "SELECT id, embedding FROM cases WHERE typeof(embedding) = 'text' AND embedding != ''"
+    ).fetchall()
+    converted = 0
+    for row in rows:
+        try:
+            embedding = json.loads(row["embedding"])
+        except (json.JSONDecodeError, TypeError):
+            print(f"[DB] Case {row['id']}: unreadable JSON embedding, left for re-embedding")
+            continue
+        cursor.execute(
+            "UPDATE cases SET embedding = ?, embedding_dim = ?, embedding_model = ? WHERE id = ?",
+            (encode_embedding(embedding), len(embedding), LEGACY_EMBEDDING_MODEL, row["id"]),
+        )
+        converted += 1
+    cursor.execute(
+        "UPDATE cases SET embedding_version = ? WHERE embedding_version IS NULL AND embedding_dim IS NOT NULL",
+        (LEGACY_EMBEDDING_VERSION,),
+    )
+    conn.commit()
+
+    if converted:
+        # Reclaim the space the JSON text used to occupy
+        conn.execute("VACUUM")
+        print(f"[DB] Migrated {converted} embedding(s) from JSON text to float32 BLOB")
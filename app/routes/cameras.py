@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Request
+
+from app.routes.officer import is_logged_in
+from app.services.camera_service import list_cameras, save_camera, delete_camera
+from app.services.camera_ingest import camera_ingest
+from app.services.executors import io_stage
+
+router = APIRouter()
+
+
+def _parse_enabled(value) -> bool:
+    """JSON booleans/numbers as-is; strings parsed like boolean env settings ("1", "true", "yes")."""
+    if isinstance(value, (bool, int)):
+        return bool(value)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    raise ValueError("enabled must be true or false.")
+
+
+@router.get("/officer/cameras")
+async def cameras(request: Request):
+    """Registered cameras, with live ingestion state for those pulled from a source."""
+    if not is_logged_in(request):
+        return {"error": "Unauthorised"}
+    registered = await io_stage.run(list_cameras)
+    ingesting  = camera_ingest.status()
+    return {"cameras": [{**camera, "ingest": ingesting.get(camera["id"])} for camera in registered]}
+
+
+@router.post("/officer/cameras")
+async def register_camera(request: Request):
+    """
+    Add or update a camera: {"id", "location", "name"?, "source"?, "enabled"?}.
+    `source` is an rtsp:// URL or a video file path to scan continuously;
+    leave it out for cameras that push frames (dashboard, /officer/ws/scan).
+    """
+    if not is_logged_in(request):
+        return {"error": "Unauthorised"}
+    body      = await request.json()
+    camera_id = str(body.get("id") or "").strip()
+    location  = str(body.get("location") or "").strip()
+    if not camera_id or not location:
+        return {"error": "Both id and location are required."}
+    try:
+        enabled = _parse_enabled(body.get("enabled", True))
+    except ValueError as e:
+        return {"error": str(e)}
+
+    camera = await io_stage.run(
+        save_camera, camera_id, location,
+        name=body.get("name"), source=body.get("source"), enabled=enabled,
+    )
+    await io_stage.run(camera_ingest.reload)
+    return {"camera": camera}
+
+
+@router.delete("/officer/cameras/{camera_id}")
+async def remove_camera(request: Request, camera_id: str):
+    if not is_logged_in(request):
+        return {"error": "Unauthorised"}
+    rows = await io_stage.run(delete_camera, camera_id)
+    await io_stage.run(camera_ingest.reload)
+    if not rows:
+        return {"error": "Camera not found."}
+    return {"deleted": camera_id}
@@ -1,7 +1,12 @@
+import json
+import time
+
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.services.gemini_service import chat_service
+from app.services.metrics import CHAT_TTFT_SECONDS
 
 router = APIRouter()
 
@@ -18,3 +23,29 @@ class ChatResponse(BaseModel):
 async def chat(req: ChatRequest):
     reply = await chat_service.get_response(req.message)
     return ChatResponse(reply=reply)
+
+
+@router.post("/api/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Server-sent events: one `data: {"delta": "..."}` event per chunk as the
+    model generates it, then `event: done` with timing (ttft_ms = time to
+    first token, the latency the user actually feels).
+    """
+    async def events():
+        info, started, ttft = {}, time.perf_counter(), None
+        async for chunk in chat_service.stream_response(req.message, info):
+            if ttft is None:
+                ttft = (time.perf_counter() - started) * 1000
+            yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        total = (time.perf_counter() - started) * 1000
+        print(f"[Chat] Streamed reply ({info.get('source')}): TTFT {ttft or total:.0f} ms, total {total:.0f} ms")
+        CHAT_TTFT_SECONDS.observe((ttft or total) / 1000, source=info.get("source") or "unknown")
+        done = {"source": info.get("source"), "ttft_ms": round(ttft or total), "total_ms": round(total)}
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
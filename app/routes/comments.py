@@ -7,10 +7,11 @@ router = APIRouter()
 templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), '..', 'templates'))
 
 from app.services.case_service import get_case_by_id
+from app.services.executors import io_stage
 
 @router.get("/case/{case_id}/comments", response_class=HTMLResponse)
 async def case_comments(request: Request, case_id: int):
-    case = get_case_by_id(case_id)
+    case = await io_stage.run(get_case_by_id, case_id)
     if not case:
         return RedirectResponse("/") # or show 404
     return templates.TemplateResponse("case_detail.html", {"request": request, "case": case})
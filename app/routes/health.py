@@ -0,0 +1,53 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.config import config
+
+router = APIRouter()
+
+
+@router.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@router.get("/health/ready")
+async def ready():
+    """
+    Readiness for load balancers: with PRELOAD_MODELS on, only report ready
+    once DeepFace and the detector are loaded and warmed up.
+    """
+    if not config.PRELOAD_MODELS:
+        return {"status": "ready", "models_preloaded": False}
+
+    from app.services.face_recognition_service import models_ready, warmup_error
+    if models_ready():
+        return {"status": "ready", "models_preloaded": True}
+    if warmup_error():
+        return JSONResponse({"status": "error", "error": warmup_error()}, status_code=503)
+    return JSONResponse({"status": "warming_up"}, status_code=503)
+
+
+@router.get("/health/embeddings")
+async def embeddings():
+    """Embedding version served to scans and progress of any background re-embed rollover."""
+    from app.services.embedding_rollover import embedding_rollover
+    return embedding_rollover.status()
+
+
+@router.get("/health/detector")
+async def detector():
+    """Detector cascade stages with per-stage hit rates, for tuning DETECTOR_CASCADE thresholds."""
+    from app.services.face_recognition_service import cascade_stats
+    return {"cascade": cascade_stats()}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint: per-stage latency histograms, counters and queue gauges."""
+    from app.services.metrics import registry
+    from app.services.executors import io_stage
+    # Gauges read queue depths from SQLite; keep that off the event loop
+    body = await io_stage.run(registry.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,7 +1,6 @@
 import os
 import sys
 import base64
-import json
 import numpy as np
 import cv2
 
@@ -12,6 +11,7 @@ from fastapi.templating import Jinja2Templates
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from app.models.database import get_connection
+from app.services.executors import decode_stage, inference_stage, io_stage, notify_stage
 
 templates = Jinja2Templates(
     directory=os.path.join(os.path.dirname(__file__), '..', 'templates')
@@ -66,20 +66,35 @@ async def officer_logout(request: Request):
     return RedirectResponse("/officer-login", status_code=302)
 
 
-from app.services.case_service import get_recent_cases
+from app.services.case_service import list_cases
+
+DASHBOARD_PAGE_SIZE = 50
+CASE_FILTERS = ("status", "state", "city", "pin_code", "date_from", "date_to")
+
 
 @router.get("/officer-dashboard", response_class=HTMLResponse)
 async def officer_dashboard(request: Request):
     if not is_logged_in(request):
         return RedirectResponse("/officer-login", status_code=302)
 
-    cases = get_recent_cases(limit=50)
+    filters = {k: request.query_params.get(k, "").strip() for k in CASE_FILTERS}
+    cursor  = request.query_params.get("cursor", "")
+    if not cursor.rpartition("|")[2].isdigit():
+        cursor = None   # missing or malformed → newest page
+    cases, next_cursor = await io_stage.run(
+        list_cases, limit=DASHBOARD_PAGE_SIZE, cursor=cursor,
+        **{k: v for k, v in filters.items() if v},
+    )
     # Pass query params for delete feedback
     deleted = request.query_params.get("deleted") == "1"
     error = request.query_params.get("error")
     return templates.TemplateResponse(
         "officer_dashboard.html",
-        {"request": request, "cases": cases, "deleted": deleted, "delete_error": error}
+        {
+            "request": request, "cases": cases, "deleted": deleted, "delete_error": error,
+            "filters": filters, "next_cursor": next_cursor, "paged": bool(cursor),
+            "show_cases": bool(cursor) or any(filters.values()),
+        }
     )
 
 
@@ -87,116 +102,325 @@ async def officer_dashboard(request: Request):
 # DeepFace scan-frame API
 # ─────────────────────────────────────────────────────────────────────────────
 
-from fastapi import APIRouter, Request, Form, BackgroundTasks
+import json
+import asyncio
+from fastapi import APIRouter, Request, Form, WebSocket, WebSocketDisconnect
+
+from app.config import config
+from app.services.embedding_index import CaseFilter
+from app.services.metrics import (
+    SCAN_STAGE_SECONDS, SCAN_SECONDS, SCANS_TOTAL, SCAN_NO_FACE_TOTAL, SCAN_ERRORS_TOTAL, SCAN_MATCHES_TOTAL,
+    SCAN_FRAME_BYTES,
+)
+
+SCAN_TOP_K = 20   # most candidates returned per detected face
+DEFAULT_CAMERA_ID = "officer-dashboard"   # face-track cache key when a client sends none
+SCAN_ROI_MARGIN = 0.6   # face widths of context the client keeps around a pre-detected face (the detector needs some)
+RAW_FRAME_TYPES = ("image/jpeg", "image/png", "image/webp", "application/octet-stream")
+
+
+def _decode_frame(img_bytes, b64: bool = False):
+    """JPEG/PNG bytes (or their base64 text) → OpenCV BGR frame (None if undecodable)."""
+    with SCAN_STAGE_SECONDS.time(stage="decode"):
+        if b64:
+            img_bytes = base64.b64decode(img_bytes)
+        np_arr = np.frombuffer(img_bytes, np.uint8)
+        return cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+
+
+def _parse_roi(data):
+    """
+    Where an uploaded image sits in the camera frame: {"x", "y"} of its
+    top-left corner in camera pixels and "scale" (uploaded px per camera px).
+    None when the client sent the full frame at camera resolution.
+    """
+    if not data:
+        return None
+    try:
+        roi = {"x": float(data.get("x") or 0), "y": float(data.get("y") or 0),
+               "scale": float(data.get("scale") or 1)}
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return roi if roi["scale"] > 0 else None
+
+
+def _to_camera_box(area: dict, roi: dict) -> dict:
+    scale = roi["scale"]
+    return {
+        **area,
+        "x": int(round(roi["x"] + area["x"] / scale)), "y": int(round(roi["y"] + area["y"] / scale)),
+        "w": int(round(area["w"] / scale)),            "h": int(round(area["h"] / scale)),
+    }
+
+
+async def _read_scan_upload(request: Request) -> tuple:
+    """
+    Frame payload + metadata from any accepted scan upload:
+      * raw image/jpeg (or png / webp / octet-stream) body, with camera_id,
+        roi_x / roi_y / roi_scale and filter fields in the query string
+      * multipart/form-data: a `frame` file and an optional `meta` JSON field
+        {"camera_id", "filter", "roi"}
+      * JSON {"frame_b64", "camera_id", "filter", "roi"} (original format)
+    Returns (payload, is_base64, meta dict).
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in RAW_FRAME_TYPES:
+        query   = request.query_params
+        payload = await request.body()
+        SCAN_FRAME_BYTES.observe(len(payload), transport="binary")
+        roi = {"x": query.get("roi_x"), "y": query.get("roi_y"), "scale": query.get("roi_scale")}
+        return payload, False, {"camera_id": query.get("camera_id"), "filter": query, "roi": roi}
+
+    if content_type == "multipart/form-data":
+        form    = await request.form()
+        upload  = form.get("frame")
+        payload = await upload.read() if upload is not None and not isinstance(upload, str) else b""
+        SCAN_FRAME_BYTES.observe(len(payload), transport="multipart")
+        return payload, False, json.loads(form.get("meta") or "{}")
+
+    body    = await request.json()
+    payload = body.get("frame_b64", "")
+    SCAN_FRAME_BYTES.observe(len(payload), transport="json")
+    return payload, True, body
+
+
+def _match_frame(frame, camera_id: str = DEFAULT_CAMERA_ID, case_filter=None, roi=None) -> tuple:
+    """
+    Detect, embed and match every face in `frame`. Faces that continue a
+    recent track on the same camera reuse its embedding and matches.
+    `case_filter` (CaseFilter) restricts matching to plausible cases; `roi`
+    (see _parse_roi) maps face boxes of a cropped / downscaled upload back
+    to camera-frame pixels.
+    Returns (response dict, matches to alert on).
+    """
+    SCANS_TOTAL.inc()
+    with SCAN_SECONDS.time():
+        try:
+            return _match_frame_stages(frame, camera_id, case_filter, roi)
+        except Exception as e:
+            # Any stage (detect, embed, search) failing counts as one scan error
+            SCAN_ERRORS_TOTAL.inc()
+            return {"error": f"Recognition error: {e}"}, []
+
+
+def _match_frame_stages(frame, camera_id: str, case_filter, roi) -> tuple:
+    from app.services.face_recognition_service import detect_faces, embed_faces, version_settings, MATCH_THRESHOLD
+    from app.services.embedding_index import get_embedding_index
+    from app.services.track_cache import track_cache
+
+    # Probe with the same pipeline as the stored embeddings (old one until a rollover cuts over)
+    index    = get_embedding_index()
+    settings = version_settings(index.version)
+    try:
+        with SCAN_STAGE_SECONDS.time(stage="detect"):
+            detected = detect_faces(frame, **settings)
+    except ValueError:
+        detected = []
+
+    if not detected:
+        SCAN_NO_FACE_TOTAL.inc()
+        return {"error": "No face detected — ensure good lighting and face the camera.", "detected": 0}, []
+
+    if len(index) == 0:
+        return {"error": "No registered cases in the database yet.", "detected": len(detected)}, []
+
+    if roi:
+        # Camera-frame coordinates, so tracks survive the crop moving between frames
+        detected = [{**face, "facial_area": _to_camera_box(face["facial_area"], roi)} for face in detected]
+
+    # ── Reuse recent tracks; embed only new/stale faces (one batched ArcFace pass) ──
+    # Tracks hold filtered matches, so each filter gets its own track set
+    track_key = f"{camera_id}|{case_filter.key()}" if case_filter else camera_id
+    tracks = track_cache.assign(track_key, [f["facial_area"] for f in detected])
+    fresh  = [i for i, track in enumerate(tracks) if track is None]
+    if fresh:
+        with SCAN_STAGE_SECONDS.time(stage="embed"):
+            embeddings = embed_faces([detected[i] for i in fresh], settings["model_name"])
+        # All new faces against every stored case in one matrix product
+        with SCAN_STAGE_SECONDS.time(stage="search"):
+            per_face = index.search_batch(list(embeddings), k=SCAN_TOP_K, max_distance=0.6,
+                                          case_filter=case_filter)
+        for i, embedding, matches in zip(fresh, embeddings, per_face):
+            tracks[i] = track_cache.store(track_key, detected[i]["facial_area"], embedding, matches)
+
+    faces, results, alert_ids = [], {}, set()
+    for face_no, (face, track) in enumerate(zip(detected, tracks)):
+        cached = face_no not in fresh
+        face_results = [
+            {**m, "face": face_no, "distance": round(m["distance"], 4), "matched": m["distance"] <= MATCH_THRESHOLD}
+            for m in track.matches
+        ]
+        faces.append({"face": face_no, "box": face["facial_area"], "cached": cached, "results": face_results})
+        # Send to each new face's top 2 results regardless of strict MATCH_THRESHOLD if they are < 0.6
+        # (tracked faces were already alerted on when first seen)
+        if not cached:
+            alert_ids.update(r["case_id"] for r in face_results[:2])
+        # Flat list keeps each case's best face only
+        for r in face_results:
+            if r["case_id"] not in results or r["distance"] < results[r["case_id"]]["distance"]:
+                results[r["case_id"]] = r
+    results = sorted(results.values(), key=lambda r: r["distance"])
+    SCAN_MATCHES_TOTAL.inc(len(results))
+
+    if not results:
+        print(f"[DEBUG] {len(faces)} face(s), no matches found at all.")
+        return {"results": [], "faces": faces, "detected": len(faces), "message": "No matches found."}, []
+
+    print(f"[DEBUG] {len(faces)} face(s) ({len(fresh)} embedded), {len(results)} matches with distance < 0.6")
+    return {"results": results, "faces": faces, "detected": len(faces)}, [r for r in results if r["case_id"] in alert_ids]
+
+
+def _queue_alerts(matches: list, camera_id: str = DEFAULT_CAMERA_ID):
+    """WhatsApp alert logic; sends run on the notify stage, never on the request path."""
+    from app.services.whatsapp_service import send_match_alert
+    from app.services.camera_service import camera_location
+    import random
+
+    for match in matches:
+        # Only alert if it's a "good" match (dist < 0.6) and has a phone number
+        if match["distance"] < 0.6 and match.get("complainant_phone"):
+            RANDOM_OFFICER = f"{random.randint(7000, 9999)}{random.randint(100000, 999999)}"
+
+            print(f"[DEBUG] Queueing alert for {match['name']} (Dist: {match['distance']}) to {match['complainant_phone']}")
+            notify_stage.submit(
+                send_match_alert,
+                complainant_phone=match["complainant_phone"],
+                missing_name=match["name"],
+                match_distance=match["distance"],
+                case_id=match["case_id"],
+                location=camera_location(camera_id),
+                officer_no=RANDOM_OFFICER
+            )
+        else:
+            print(f"[DEBUG] Skipping alert for {match['name']} (Dist: {match['distance']}, HasPhone: {bool(match.get('complainant_phone'))})")
+
+
+@router.get("/officer/scan-config")
+async def scan_config(request: Request):
+    """Upload settings the dashboard scanner should use: frame size, JPEG quality, face-region crop."""
+    if not is_logged_in(request):
+        return {"error": "Unauthorised"}
+    return {
+        "max_side":     config.SCAN_MAX_SIDE,
+        "jpeg_quality": config.SCAN_JPEG_QUALITY,
+        "roi":          config.SCAN_ROI,
+        "roi_margin":   SCAN_ROI_MARGIN,
+        "formats":      [*RAW_FRAME_TYPES[:3], "multipart/form-data", "application/json"],
+    }
+
 
 @router.post("/officer/scan-frame")
-async def scan_frame(request: Request, background_tasks: BackgroundTasks):
+async def scan_frame(request: Request):
     if not is_logged_in(request):
         return {"error": "Unauthorised"}
 
     try:
-        body      = await request.json()
-        frame_b64 = body.get("frame_b64", "")
-
-        # Decode base64 → OpenCV BGR frame
-        img_bytes = base64.b64decode(frame_b64)
-        np_arr    = np.frombuffer(img_bytes, np.uint8)
-        frame     = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        payload, b64, meta = await _read_scan_upload(request)
+        camera_id   = str(meta.get("camera_id") or DEFAULT_CAMERA_ID)
+        case_filter = CaseFilter.from_dict(meta.get("filter"))   # optional {states, cities, gender, age_min, age_max}
+        roi         = _parse_roi(meta.get("roi"))
 
+        # Decode → OpenCV BGR frame
+        frame = await decode_stage.run(_decode_frame, payload, b64)
         if frame is None:
             return {"error": "Could not decode image frame."}
 
-        # ── Preprocessing ──────────────────
-        from app.services.face_recognition_service import embedding_from_frame, cosine_distance
-        
-        try:
-            print("[DEBUG] Extracting embedding from frame...")
-            probe_emb = embedding_from_frame(frame)
-        except Exception as e:
-            err = str(e)
-            if "Face could not be detected" in err or "enforce_detection" in err:
-                return {"error": "No face detected — ensure good lighting and face the camera."}
-            return {"error": f"Recognition error: {err}"}
-
-        # Load cases
-        conn   = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, missing_full_name, gender, embedding, complainant_phone FROM cases WHERE embedding != ''"
-        )
-        cases = cursor.fetchall()
-        conn.close()
-
-        if not cases:
-            return {"error": "No registered cases in the database yet."}
-
-        results = []
-        from app.services.face_recognition_service import MATCH_THRESHOLD
-        
-        for case in cases:
-            try:
-                stored_emb = np.array(json.loads(case["embedding"]))
-                dist = cosine_distance(probe_emb, stored_emb)
-                
-                # Keep if it's a reasonable match
-                if dist < 0.7:
-                    results.append({
-                        "case_id":  case["id"],
-                        "name":     case["missing_full_name"],
-                        "distance": round(dist, 4),
-                        "matched":  dist <= MATCH_THRESHOLD,
-                        "complainant_phone": case["complainant_phone"],
-                        "gender": case["gender"]
-                    })
-            except Exception as e:
-                continue
+        response, to_alert = await inference_stage.run(_match_frame, frame, camera_id, case_filter, roi)
 
-        if not results:
-            print("[DEBUG] No matches found at all.")
-            return {"results": [], "message": "No matches found."}
-
-        results.sort(key=lambda x: x["distance"])
-        # Display results with dist < 0.6
-        filtered_results = [r for r in results if r["distance"] < 0.6]
-        print(f"[DEBUG] Found {len(filtered_results)} matches with distance < 0.6")
-        
-        # WhatsApp Alert Logic (Background Task)
-        # Send to top 2 results regardless of strict MATCH_THRESHOLD if they are < 0.6
-        top_two = results[:2]
-        
-        from app.services.whatsapp_service import send_match_alert
-        import random
-
-        for match in top_two:
-            # Only alert if it's a "good" match (dist < 0.6) and has a phone number
-            if match["distance"] < 0.6 and match.get("complainant_phone"):
-                SCAN_LOCATION = "Main Terminal - Gate 4 (CCTV-08)"
-                RANDOM_OFFICER = f"{random.randint(7000, 9999)}{random.randint(100000, 999999)}"
-                
-                print(f"[DEBUG] Queueing alert for {match['name']} (Dist: {match['distance']}) to {match['complainant_phone']}")
-                background_tasks.add_task(
-                    send_match_alert,
-                    complainant_phone=match["complainant_phone"],
-                    missing_name=match["name"],
-                    match_distance=match["distance"],
-                    case_id=match["case_id"],
-                    location=SCAN_LOCATION,
-                    officer_no=RANDOM_OFFICER
-                )
-            else:
-                print(f"[DEBUG] Skipping alert for {match['name']} (Dist: {match['distance']}, HasPhone: {bool(match.get('complainant_phone'))})")
-
-        return {"results": filtered_results}
+        # WhatsApp Alert Logic (notify stage)
+        _queue_alerts(to_alert, camera_id)
+        return response
 
     except Exception as e:
         print(f"[ERROR] scan_frame: {e}")
         return {"error": str(e)}
 
-    except Exception as e:
-        err = str(e)
-        if "Face could not be detected" in err or "enforce_detection" in err:
-            return {"error": "No face detected — ensure good lighting and face the camera."}
-        return {"error": err}
+
+@router.websocket("/officer/ws/scan")
+async def scan_ws(websocket: WebSocket):
+    """
+    Live scanning channel: the client streams binary JPEG frames and gets
+    match results pushed back. Frames are coalesced latest-frame-wins, so if
+    inference falls behind, stale frames are skipped rather than queued.
+
+    A scan filter comes from the query string (?states=Kerala,Goa&gender=female
+    &age_min=5&age_max=12) and can be replaced mid-stream with a text message
+    {"filter": {...}}. A text message {"roi": {...}} (see _parse_roi) describes
+    the crop / downscale of the binary frame that follows it.
+    """
+    if websocket.session.get("officer") != ADMIN_USERNAME:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+
+    try:
+        case_filter = CaseFilter.from_dict(websocket.query_params)
+    except ValueError as e:   # e.g. ?age_min=abc
+        await websocket.send_json({"error": f"Invalid scan filter: {e}"})
+        await websocket.close(code=1008)
+        return
+
+    camera_id = websocket.query_params.get("camera_id") or DEFAULT_CAMERA_ID
+    latest    = {"frame": None, "roi": None, "seq": 0, "skipped": 0, "filter": case_filter}
+    new_frame = asyncio.Event()
+
+    async def receive_frames():
+        next_roi = None   # applies to the next binary frame only
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("text"):
+                try:
+                    data = json.loads(message["text"])
+                    if "filter" in data:
+                        latest["filter"] = CaseFilter.from_dict(data["filter"])
+                    if "roi" in data:
+                        next_roi = _parse_roi(data["roi"])
+                except (ValueError, AttributeError, TypeError) as e:
+                    print(f"[ERROR] scan_ws: bad control message: {e}")
+                continue
+            frame_bytes = message.get("bytes")
+            if not frame_bytes:
+                continue
+            SCAN_FRAME_BYTES.observe(len(frame_bytes), transport="ws")
+            if latest["frame"] is not None:
+                latest["skipped"] += 1   # previous frame never reached inference
+            latest["frame"], latest["roi"], next_roi = frame_bytes, next_roi, None
+            latest["seq"]  += 1
+            new_frame.set()
+
+    async def process_frames():
+        while True:
+            await new_frame.wait()
+            new_frame.clear()
+            frame_bytes, roi, seq = latest["frame"], latest["roi"], latest["seq"]
+            latest["frame"] = None
+            if frame_bytes is None:
+                continue
+            try:
+                frame = await decode_stage.run(_decode_frame, frame_bytes)
+                if frame is None:
+                    response, to_alert = {"error": "Could not decode image frame."}, []
+                else:
+                    response, to_alert = await inference_stage.run(
+                        _match_frame, frame, camera_id, latest["filter"], roi
+                    )
+                _queue_alerts(to_alert, camera_id)
+            except Exception as e:
+                print(f"[ERROR] scan_ws: {e}")
+                response = {"error": str(e)}
+            try:
+                await websocket.send_json({**response, "seq": seq, "skipped": latest["skipped"]})
+            except (WebSocketDisconnect, RuntimeError):
+                return
+
+    tasks = [asyncio.create_task(receive_frames()), asyncio.create_task(process_frames())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
 @router.post("/officer/delete-case/{case_id}")
@@ -208,7 +432,7 @@ async def delete_case_route(request: Request, case_id: int):
 
     from app.services.case_service import delete_case
     try:
-        rows = delete_case(case_id)
+        rows = await io_stage.run(delete_case, case_id)
         print(f"[DEBUG] Deleted case {case_id}. Rows affected: {rows}")
         if rows > 0:
             return RedirectResponse("/officer-dashboard?deleted=1", status_code=303)
@@ -3,6 +3,8 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 import os
 from app.services.case_service import save_case
+from app.services.embedding_queue import QueueFull
+from app.services.executors import io_stage, notify_stage
 
 router = APIRouter()
 templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), '..', 'templates'))
@@ -45,12 +47,22 @@ async def report_post(
         "address_line1": address_line1
     }
 
-    case_id = save_case(form_data, missing_image)
+    # File + DB writes run on the io stage so the event loop stays free
+    try:
+        case_id = await io_stage.run(save_case, form_data, missing_image)
+    except QueueFull:
+        # Embedding backlog is full: nothing was saved, ask the reporter to resubmit shortly
+        return HTMLResponse(
+            "We are receiving a very high number of reports right now. "
+            "Please go back and submit the report again in a minute.",
+            status_code=503, headers={"Retry-After": "60"},
+        )
 
-    # Send WhatsApp confirmation to complainant
+    # Send WhatsApp confirmation to complainant (notify stage; doesn't delay the redirect)
     try:
         from app.services.whatsapp_service import send_report_confirmation
-        send_report_confirmation(
+        notify_stage.submit(
+            send_report_confirmation,
             complainant_phone=complainant_phone,
             complainant_name=complainant_name,
             missing_name=missing_full_name,
@@ -0,0 +1,230 @@
+import time
+import threading
+
+from app.models.database import get_connection
+from app.config import config
+from app.services.metrics import ALERT_SEND_SECONDS, ALERTS_SENT_TOTAL, ALERT_FAILURES_TOTAL
+
+MAX_ATTEMPTS     = 5
+RETRY_BASE_DELAY = 2.0    # seconds; doubles on every retry
+POLL_INTERVAL    = 0.5    # seconds between outbox polls when idle
+
+
+class DeliveryError(Exception):
+    """Raised by a transport; `retryable` says whether backing off and retrying may help."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class RateLimiter:
+    """Token bucket shared by all sender threads (global send-rate limit)."""
+
+    def __init__(self, rate_per_sec: float, burst: int):
+        self.rate     = max(rate_per_sec, 0.001)
+        self.capacity = max(1, burst)
+        self._tokens  = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock    = threading.Lock()
+
+    def acquire(self, stop_event: threading.Event = None) -> bool:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens  = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop_event is not None and stop_event.wait(wait):
+                return False
+            if stop_event is None:
+                time.sleep(wait)
+
+
+class AlertDispatcher:
+    """
+    Durable WhatsApp outbox.
+
+    send_match_alert / send_report_confirmation only insert a row into
+    `alert_outbox`; a small pool of sender threads delivers them through one
+    pooled HTTP client, retrying transient failures with exponential backoff
+    under a global send-rate limit. Duplicate alerts for the same case or to
+    the same phone inside the dedup windows are suppressed at enqueue time,
+    so a person standing in front of a camera produces one message, not a
+    burst.
+    """
+
+    def __init__(self, senders: int, rate_per_sec: float, burst: int,
+                 case_window: float, phone_window: float):
+        self.senders      = max(1, senders)
+        self.case_window  = case_window
+        self.phone_window = phone_window
+        self.limiter      = RateLimiter(rate_per_sec, burst)
+        self._transport   = None
+        self._threads     = []
+        self._stop        = threading.Event()
+        self._wake        = threading.Event()
+        self._lock        = threading.Lock()   # dedup check + insert, and claiming
+
+    # ── Enqueue ───────────────────────────────────────────────────────────────
+    def enqueue(self, kind: str, to_number: str, body: str, case_id: int = None,
+                dedup: bool = True) -> int:
+        """
+        Add a message to the outbox. Returns its id, or None if an equivalent
+        alert (same kind, and same case or same phone) is inside its dedup window.
+        """
+        now = time.time()
+        with self._lock:
+            conn = get_connection()
+            try:
+                if dedup:
+                    duplicate = conn.execute(
+                        "SELECT id FROM alert_outbox WHERE kind = ? AND status != 'failed' AND ("
+                        "  (case_id = ? AND created_at > ?) OR (to_number = ? AND created_at > ?)"
+                        ") LIMIT 1",
+                        (kind, case_id, now - self.case_window, to_number, now - self.phone_window),
+                    ).fetchone()
+                    if duplicate is not None:
+                        return None
+                cursor = conn.execute(
+                    "INSERT INTO alert_outbox (kind, case_id, to_number, body, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (kind, case_id, to_number, body, now),
+                )
+                conn.commit()
+                alert_id = cursor.lastrowid
+            finally:
+                conn.close()
+        self._wake.set()
+        return alert_id
+
+    def depth(self) -> int:
+        """Messages not yet delivered (pending or in flight)."""
+        conn = get_connection()
+        row  = conn.execute(
+            "SELECT COUNT(*) FROM alert_outbox WHERE status IN ('pending', 'sending')"
+        ).fetchone()
+        conn.close()
+        return row[0]
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────────
+    def start(self, transport=None):
+        """
+        Start the sender threads. `transport(to_number, body) -> sid` delivers
+        one message; defaults to the pooled Twilio client.
+        """
+        if self._threads:
+            return
+        if transport is None:
+            from app.services.whatsapp_service import twilio_transport
+            transport = twilio_transport
+        self._transport = transport
+
+        conn = get_connection()
+        conn.execute("UPDATE alert_outbox SET status = 'pending' WHERE status = 'sending'")
+        conn.commit()
+        conn.close()
+
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._sender_loop, name=f"alert-sender-{i}", daemon=True)
+            for i in range(self.senders)
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f"[AlertDispatcher] Started {self.senders} sender thread(s)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    # ── Sending ───────────────────────────────────────────────────────────────
+    def _sender_loop(self):
+        while not self._stop.is_set():
+            alert = self._claim_next()
+            if alert is None:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            if not self.limiter.acquire(self._stop):
+                self._release(alert)
+                return
+            self._deliver(alert)
+
+    def _claim_next(self):
+        with self._lock:
+            conn = get_connection()
+            try:
+                row = conn.execute(
+                    "SELECT id, kind, to_number, body, attempts, case_id FROM alert_outbox "
+                    "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT 1",
+                    (time.time(),),
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE alert_outbox SET status = 'sending' WHERE id = ?", (row["id"],))
+                conn.commit()
+                return dict(row)
+            finally:
+                conn.close()
+
+    def _release(self, alert: dict):
+        conn = get_connection()
+        conn.execute("UPDATE alert_outbox SET status = 'pending' WHERE id = ?", (alert["id"],))
+        conn.commit()
+        conn.close()
+
+    def _deliver(self, alert: dict):
+        try:
+            with ALERT_SEND_SECONDS.time():
+                sid = self._transport(alert["to_number"], alert["body"])
+        except Exception as e:
+            retryable = getattr(e, "retryable", True)
+            self._failed(alert, e, retryable)
+            return
+        ALERTS_SENT_TOTAL.inc(kind=alert["kind"])
+        conn = get_connection()
+        conn.execute(
+            "UPDATE alert_outbox SET status = 'sent', sid = ?, sent_at = ?, attempts = attempts + 1 WHERE id = ?",
+            (sid, time.time(), alert["id"]),
+        )
+        conn.commit()
+        conn.close()
+        print(f"[AlertDispatcher] Message sent ✔  SID: {sid}  →  {alert['to_number']}")
+
+    def _failed(self, alert: dict, error: Exception, retryable: bool):
+        attempts = alert["attempts"] + 1
+        final    = not retryable or attempts >= MAX_ATTEMPTS
+        ALERT_FAILURES_TOTAL.inc(kind=alert["kind"], final=str(final).lower())
+        conn = get_connection()
+        if final:
+            conn.execute(
+                "UPDATE alert_outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                (attempts, str(error), alert["id"]),
+            )
+            print(f"[AlertDispatcher] Giving up on alert {alert['id']} → {alert['to_number']}: {error}")
+        else:
+            delay = RETRY_BASE_DELAY * 2 ** (attempts - 1)
+            conn.execute(
+                "UPDATE alert_outbox SET status = 'pending', attempts = ?, last_error = ?, "
+                "next_attempt_at = ? WHERE id = ?",
+                (attempts, str(error), time.time() + delay, alert["id"]),
+            )
+            print(f"[AlertDispatcher] Alert {alert['id']} attempt {attempts} failed ({error}); retrying in {delay:.0f}s")
+        conn.commit()
+        conn.close()
+
+
+alert_dispatcher = AlertDispatcher(
+    senders=config.ALERT_SENDERS,
+    rate_per_sec=config.ALERT_RATE_PER_SEC,
+    burst=config.ALERT_BURST,
+    case_window=config.ALERT_CASE_WINDOW,
+    phone_window=config.ALERT_PHONE_WINDOW,
+)
@@ -0,0 +1,201 @@
+import os
+import numpy as np
+
+from app.services.embedding_index import EmbeddingIndex, _VectorBlock, ATTR_DTYPE
+
+# Below this many vectors a single list (i.e. exact search) is already cheap
+MIN_TRAIN_SIZE = 1024
+# Re-train the quantiser on load once the DB has grown this much since training
+RETRAIN_GROWTH = 4
+# Vectors per centroid sampled for k-means; caps training time on huge DBs
+TRAIN_SAMPLES_PER_LIST = 64
+ASSIGN_CHUNK = 16384
+
+
+class IVFIndex(EmbeddingIndex):
+    """
+    Approximate nearest-neighbour index (inverted file, pure NumPy).
+
+    A spherical k-means quantiser splits the case vectors into `nlist`
+    clusters, each stored as its own contiguous block. A query is compared
+    against the centroids first and only the `nprobe` closest blocks are
+    scanned, so cost grows with N / nlist * nprobe instead of N.
+
+    Inserts go straight into the nearest existing list and deletes are O(1),
+    so the index stays current without re-training. The trained centroids are
+    persisted to `path` (next to database.db); the lists themselves are
+    rebuilt from the cases table on load, which only costs one assignment pass.
+    Scan filters are applied as row masks inside the probed lists (lists are
+    partitioned by vector, not by region).
+    """
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8, path: str = None):
+        self.nlist_config = nlist
+        self.nprobe       = max(1, nprobe)
+        self.path         = path
+        super().__init__()
+
+    def _reset(self):
+        self._dim          = None
+        self._centroids    = None   # (nlist, dim) unit vectors; None until trained
+        self._lists        = []     # one _VectorBlock per centroid
+        self._positions    = {}     # case_id -> (list_no, row)
+        self._trained_size = 0
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    # ── Loading / training ────────────────────────────────────────────────────
+    def _after_load(self):
+        if self._load_centroids():
+            if len(self) >= RETRAIN_GROWTH * max(self._trained_size, 1):
+                self.train()
+            else:
+                self._reassign()
+        elif len(self) >= MIN_TRAIN_SIZE:
+            self.train()
+
+    def train(self, nlist: int = None, n_iter: int = 10, seed: int = 0):
+        """(Re)train the quantiser on the current vectors and redistribute them."""
+        with self._lock:
+            vectors, _, _ = self._all_vectors()
+            if len(vectors) == 0:
+                return
+            nlist = nlist or self.nlist_config or int(np.sqrt(len(vectors)))
+            nlist = int(min(max(1, nlist), len(vectors)))
+
+            rng = np.random.default_rng(seed)
+            n_samples = min(len(vectors), nlist * TRAIN_SAMPLES_PER_LIST)
+            sample = vectors[rng.choice(len(vectors), n_samples, replace=False)]
+            self._centroids    = _spherical_kmeans(sample, nlist, n_iter, rng)
+            self._trained_size = len(vectors)
+            self._reassign()
+            self._save_centroids()
+            print(f"[IVFIndex] Trained {nlist} lists on {n_samples} of {len(vectors)} vectors")
+
+    def _all_vectors(self):
+        vectors = [b.vectors[:b.size] for b in self._lists if b.size]
+        ids     = [b.ids[:b.size] for b in self._lists if b.size]
+        attrs   = [b.attrs[:b.size] for b in self._lists if b.size]
+        if not vectors:
+            return (np.empty((0, self._dim or 0), dtype=np.float32), np.empty(0, dtype=np.int64),
+                    np.empty(0, dtype=ATTR_DTYPE))
+        return np.concatenate(vectors), np.concatenate(ids), np.concatenate(attrs)
+
+    def _reassign(self):
+        vectors, ids, attrs = self._all_vectors()
+        assign = _assign(vectors, self._centroids)
+        order  = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=len(self._centroids))
+
+        self._lists     = []
+        self._positions = {}
+        start = 0
+        for list_no, count in enumerate(counts):
+            rows  = order[start:start + count]
+            start += count
+            self._lists.append(_VectorBlock.from_arrays(vectors[rows], ids[rows], attrs[rows]))
+            self._positions.update(
+                (case_id, (list_no, row)) for row, case_id in enumerate(ids[rows].tolist())
+            )
+
+    def _save_centroids(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self._centroids, trained_size=self._trained_size,
+                 version=np.array(self.version or ""))
+        os.replace(tmp_path, self.path)
+
+    def _load_centroids(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                centroids    = data["centroids"].astype(np.float32)
+                trained_size = int(data["trained_size"])
+                version      = str(data["version"]) if "version" in data else None
+        except (OSError, KeyError, ValueError) as e:
+            print(f"[IVFIndex] Ignoring unreadable {self.path}: {e}")
+            return False
+        if version and version != self.version:
+            print(f"[IVFIndex] Stored centroids were trained on {version}, index serves {self.version}; re-training")
+            return False
+        if self._dim is not None and centroids.shape[1] != self._dim:
+            print(f"[IVFIndex] Stored centroids have {centroids.shape[1]} dims, index has {self._dim}; re-training")
+            return False
+        self._dim          = centroids.shape[1]
+        self._centroids    = centroids
+        self._trained_size = trained_size
+        return True
+
+    # ── Mutation ──────────────────────────────────────────────────────────────
+    def _insert(self, case_id: int, vec: np.ndarray, attrs):
+        self._delete(case_id)
+        if not self._lists:
+            self._lists = [_VectorBlock(self._dim)]
+        list_no = int(np.argmax(self._centroids @ vec)) if self.trained else 0
+        self._positions[case_id] = (list_no, self._lists[list_no].append(case_id, vec, attrs))
+
+    def _delete(self, case_id: int) -> bool:
+        position = self._positions.pop(case_id, None)
+        if position is None:
+            return False
+        list_no, row = position
+        moved_id = self._lists[list_no].remove(row)
+        if moved_id is not None:
+            self._positions[moved_id] = (list_no, row)
+        return True
+
+    # ── Search ────────────────────────────────────────────────────────────────
+    def _candidates_batch(self, Q: np.ndarray, case_filter=None) -> list:
+        # Each probe visits its own set of lists, so probes are scanned one by one
+        return [self._candidates(q, case_filter) for q in Q]
+
+    def _candidates(self, q: np.ndarray, case_filter=None):
+        if not self.trained:
+            distances, ids = self._lists[0].candidates(q[None], case_filter)
+            return distances[0], ids
+
+        nprobe = min(self.nprobe, len(self._centroids))
+        scores = self._centroids @ q
+        probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        blocks = [self._lists[p] for p in probes if self._lists[p].size]
+        if not blocks:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        results = [b.candidates(q[None], case_filter) for b in blocks]
+        return (
+            np.concatenate([d[0] for d, _ in results]),
+            np.concatenate([i for _, i in results]),
+        )
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (max cosine) per vector, chunked to bound memory."""
+    out = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        chunk = vectors[start:start + ASSIGN_CHUNK]
+        out[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return out
+
+
+def _spherical_kmeans(data: np.ndarray, k: int, n_iter: int, rng) -> np.ndarray:
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = _assign(data, centroids)
+        counts = np.bincount(assign, minlength=k)
+        order  = np.argsort(assign, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums   = np.zeros_like(centroids)
+        used   = counts > 0
+        sums[used] = np.add.reduceat(data[order], starts[used], axis=0)
+
+        # Re-seed empty clusters from random points so every list gets used
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
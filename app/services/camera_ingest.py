@@ -0,0 +1,257 @@
+import time
+import threading
+
+import cv2
+
+from app.config import config
+from app.services.alert_dispatcher import RateLimiter
+from app.services.executors import inference_stage
+from app.services.metrics import CAMERA_FRAMES_TOTAL
+
+MIN_INTERVAL      = 0.2    # seconds between sampled frames while faces are in view
+MAX_INTERVAL      = 2.0    # ... on a camera that has shown no face for a while
+INTERVAL_BACKOFF  = 1.5    # interval growth per scan without a face
+ACTIVITY_WINDOW   = 10.0   # seconds a face keeps a camera "active"
+ACTIVE_WEIGHT     = 4.0    # scheduling share of an active camera vs an idle one (1.0)
+RECONNECT_MAX     = 30.0   # seconds; cap on the reconnect backoff of a failing stream
+MAX_IN_FLIGHT     = max(1, config.INFERENCE_THREADS - 1)   # leave an inference thread for dashboard scans
+
+
+class CameraReader:
+    """
+    Pulls one RTSP stream or video file on its own thread. Every frame is
+    grabbed (so a live stream never lags behind its buffer) but only one
+    per `interval` is decoded and offered to the scheduler; an unscanned
+    frame is replaced by the next sample (latest frame wins).
+
+    The interval adapts to what the camera shows: MIN_INTERVAL right after a
+    face was seen, growing by INTERVAL_BACKOFF per empty scan up to
+    MAX_INTERVAL. Files are played at their own frame rate and looped.
+    """
+
+    def __init__(self, camera: dict, pass_value: float = 0.0):
+        self.camera_id    = camera["id"]
+        self.source       = camera["source"]
+        self.is_file      = "://" not in self.source
+        self.interval     = MIN_INTERVAL
+        self.pass_value   = pass_value   # stride-scheduling position (lower = served next)
+        self.in_flight    = False
+        self.state        = "connecting"   # connecting | streaming | reconnecting | stopped
+        self.scans        = 0
+        self.last_face_at = 0.0
+        self._frame       = None
+        self._lock        = threading.Lock()
+        self._stop        = threading.Event()
+        self._thread      = threading.Thread(target=self._run, name=f"camera-{self.camera_id}", daemon=True)
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────────
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.state = "stopped"
+
+    # ── Scheduler side ────────────────────────────────────────────────────────
+    def has_frame(self) -> bool:
+        return self._frame is not None and not self.in_flight
+
+    def take(self):
+        with self._lock:
+            frame, self._frame = self._frame, None
+        return frame
+
+    def weight(self, now: float) -> float:
+        return ACTIVE_WEIGHT if now - self.last_face_at <= ACTIVITY_WINDOW else 1.0
+
+    def record(self, faces_seen: bool):
+        """Adapt the sampling interval to the result of a scan."""
+        self.scans += 1
+        if faces_seen:
+            self.last_face_at = time.monotonic()
+            self.interval     = MIN_INTERVAL
+        else:
+            self.interval = min(MAX_INTERVAL, self.interval * INTERVAL_BACKOFF)
+
+    def status(self) -> dict:
+        since_face = time.monotonic() - self.last_face_at if self.last_face_at else None
+        return {
+            "state":         self.state,
+            "interval":      round(self.interval, 2),
+            "scans":         self.scans,
+            "last_face_ago": round(since_face, 1) if since_face is not None else None,
+            "active":        since_face is not None and since_face <= ACTIVITY_WINDOW,
+        }
+
+    # ── Reader loop ───────────────────────────────────────────────────────────
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            capture = cv2.VideoCapture(self.source)
+            if not capture.isOpened():
+                self.state = "reconnecting"
+                print(f"[CameraIngest] {self.camera_id}: could not open {self.source}; retrying in {backoff:.0f}s")
+                if self._stop.wait(backoff):
+                    break
+                backoff = min(RECONNECT_MAX, backoff * 2)
+                continue
+            backoff = 1.0
+            self.state = "streaming"
+            try:
+                self._read(capture)
+            finally:
+                capture.release()
+            if not self._stop.is_set():
+                self.state = "reconnecting"
+                print(f"[CameraIngest] {self.camera_id}: stream ended; reconnecting")
+                self._stop.wait(backoff)
+
+    def _read(self, capture):
+        frame_period = 1.0 / (capture.get(cv2.CAP_PROP_FPS) or 25.0) if self.is_file else 0.0
+        last_sample, grabbed = 0.0, False
+        while not self._stop.is_set():
+            if not capture.grab():
+                if self.is_file and grabbed:
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)   # loop test footage
+                    grabbed = False
+                    continue
+                return
+            grabbed = True
+            now = time.monotonic()
+            if now - last_sample >= self.interval:
+                ok, frame = capture.retrieve()   # decode only the frames we sample
+                if ok:
+                    last_sample = now
+                    with self._lock:
+                        if self._frame is not None:
+                            CAMERA_FRAMES_TOTAL.inc(camera=self.camera_id, outcome="superseded")
+                        self._frame = frame
+                    CAMERA_FRAMES_TOTAL.inc(camera=self.camera_id, outcome="sampled")
+            if frame_period:
+                self._stop.wait(frame_period)
+
+
+class CameraIngest:
+    """
+    Continuous scanning of every registered camera that has a `source`.
+
+    One CameraReader per camera samples frames; a scheduler thread hands
+    them to the shared inference stage under a fixed budget of
+    CAMERA_SCAN_BUDGET scans per second (token bucket) and at most
+    MAX_IN_FLIGHT at a time. Cameras share the budget by stride
+    scheduling: each scan advances a camera's pass by 1/weight and the
+    ready camera with the lowest pass goes next, so every camera keeps
+    getting scanned while cameras with recent face activity get
+    ACTIVE_WEIGHT times the share of idle ones.
+    """
+
+    def __init__(self, scans_per_sec: float):
+        self.limiter    = RateLimiter(scans_per_sec, burst=max(1, int(scans_per_sec)))
+        self._readers   = {}   # camera_id -> CameraReader
+        self._in_flight = 0
+        self._lock      = threading.Lock()
+        self._wake      = threading.Event()
+        self._stop      = threading.Event()
+        self._thread    = None
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────────
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.reload()
+        self._thread = threading.Thread(target=self._schedule, name="camera-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            readers, self._readers = list(self._readers.values()), {}
+        for reader in readers:
+            reader.stop()
+
+    def reload(self):
+        """Sync readers with the registry (call after cameras are added, changed or removed)."""
+        from app.services.camera_service import list_cameras
+        cameras = {c["id"]: c for c in list_cameras(with_source_only=True, enabled_only=True)}
+        with self._lock:
+            stale = [r for cid, r in self._readers.items()
+                     if cid not in cameras or cameras[cid]["source"] != r.source]
+            for reader in stale:
+                del self._readers[reader.camera_id]
+            # Newcomers start level with the least-served camera instead of owing it a backlog
+            start_pass = min((r.pass_value for r in self._readers.values()), default=0.0)
+            added = [CameraReader(c, start_pass) for cid, c in cameras.items() if cid not in self._readers]
+            for reader in added:
+                self._readers[reader.camera_id] = reader
+        for reader in stale:
+            reader.stop()
+        for reader in added:
+            reader.start()
+        if stale or added:
+            print(f"[CameraIngest] {len(cameras)} camera(s) ingesting "
+                  f"(+{len(added)} / -{len(stale)}), budget {self.limiter.rate:g} scans/s")
+
+    def status(self) -> dict:
+        with self._lock:
+            return {camera_id: reader.status() for camera_id, reader in self._readers.items()}
+
+    # ── Scheduler ─────────────────────────────────────────────────────────────
+    def _next_reader(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._in_flight >= MAX_IN_FLIGHT:
+                return None
+            ready = [r for r in self._readers.values() if r.has_frame()]
+            if not ready:
+                return None
+            reader = min(ready, key=lambda r: r.pass_value)
+            reader.pass_value += 1.0 / reader.weight(now)
+            reader.in_flight   = True
+            self._in_flight   += 1
+            return reader
+
+    def _schedule(self):
+        while not self._stop.is_set():
+            if not self.limiter.acquire(self._stop):
+                return
+            reader = self._next_reader()
+            while reader is None:
+                self._wake.wait(0.05)
+                self._wake.clear()
+                if self._stop.is_set():
+                    return
+                reader = self._next_reader()
+            frame = reader.take()
+            if frame is None:
+                self._done(reader)
+                continue
+            inference_stage.submit(self._scan, reader, frame)
+
+    def _scan(self, reader: CameraReader, frame):
+        from app.routes.officer import _match_frame, _queue_alerts
+        try:
+            response, to_alert = _match_frame(frame, reader.camera_id)
+            _queue_alerts(to_alert, reader.camera_id)
+            # "detected" is only set once detection ran; recognition errors say nothing about the scene
+            if response.get("detected") is not None:
+                reader.record(response["detected"] > 0)
+            CAMERA_FRAMES_TOTAL.inc(camera=reader.camera_id, outcome="scanned")
+        except Exception as e:
+            print(f"[CameraIngest] {reader.camera_id}: scan failed: {e}")
+        finally:
+            self._done(reader)
+
+    def _done(self, reader: CameraReader):
+        with self._lock:
+            reader.in_flight  = False
+            self._in_flight  -= 1
+        self._wake.set()
+
+
+camera_ingest = CameraIngest(scans_per_sec=config.CAMERA_SCAN_BUDGET)
@@ -0,0 +1,75 @@
+import threading
+
+from app.models.database import get_connection
+
+CAMERA_COLUMNS = "id, name, location, source, enabled, created_at"
+
+# camera_id -> location, read on every alert; refreshed whenever the registry changes
+_locations      = None
+_locations_lock = threading.Lock()
+
+
+def list_cameras(with_source_only: bool = False, enabled_only: bool = False) -> list:
+    where = []
+    if with_source_only:
+        where.append("source IS NOT NULL AND source != ''")
+    if enabled_only:
+        where.append("enabled = 1")
+    conn = get_connection()
+    rows = conn.execute(
+        f"SELECT {CAMERA_COLUMNS} FROM cameras"
+        + (f" WHERE {' AND '.join(where)}" if where else "")
+        + " ORDER BY id"
+    ).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def get_camera(camera_id: str):
+    conn = get_connection()
+    row  = conn.execute(f"SELECT {CAMERA_COLUMNS} FROM cameras WHERE id = ?", (camera_id,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def save_camera(camera_id: str, location: str, name: str = None, source: str = None,
+                enabled: bool = True) -> dict:
+    """Register a camera, or update it if the id exists."""
+    conn = get_connection()
+    conn.execute(
+        "INSERT INTO cameras (id, name, location, source, enabled) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET name = excluded.name, location = excluded.location, "
+        "source = excluded.source, enabled = excluded.enabled",
+        (camera_id, name, location, source or None, int(bool(enabled))),
+    )
+    conn.commit()
+    conn.close()
+    _invalidate_locations()
+    return get_camera(camera_id)
+
+
+def delete_camera(camera_id: str) -> int:
+    conn = get_connection()
+    rows = conn.execute("DELETE FROM cameras WHERE id = ?", (camera_id,)).rowcount
+    conn.commit()
+    conn.close()
+    _invalidate_locations()
+    return rows
+
+
+def camera_location(camera_id: str) -> str:
+    """Registered location of a camera, for match alerts."""
+    global _locations
+    with _locations_lock:
+        if _locations is None:
+            conn = get_connection()
+            _locations = {row["id"]: row["location"] for row in conn.execute("SELECT id, location FROM cameras")}
+            conn.close()
+        location = _locations.get(camera_id)
+    return location or f"Unregistered camera ({camera_id})"
+
+
+def _invalidate_locations():
+    global _locations
+    with _locations_lock:
+        _locations = None
@@ -1,34 +1,55 @@
 import os
-import json
 import uuid
-import shutil
-import threading
 import numpy as np
-from app.models.database import get_connection
+from app.models.database import get_connection, encode_embedding
 from app.config import config
+from app.services.embedding_index import embedding_index, get_embedding_index, _meta_from_row
+from app.services.embedding_queue import embedding_queue, QueueFull
+from app.services.embedding_cache import embedding_cache, copy_and_hash
 
 
-def _generate_embedding_background(case_id: int, image_path: str):
-    """Generate embedding in background and update the case."""
-    try:
-        from app.services.face_recognition_service import get_embedding
-        _embedding = get_embedding(image_path)
-        if _embedding:
-            embedding_json = json.dumps(_embedding)
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE cases SET embedding = ? WHERE id = ?", (embedding_json, case_id))
-            conn.commit()
-            conn.close()
-            print(f"[CaseService] Embedding generated for case {case_id}")
-    except Exception as e:
-        print(f"[CaseService] Embedding error for case {case_id}: {e}")
+def store_case_embedding(case_id: int, embedding: list, version: str = None):
+    """
+    Persist a freshly computed embedding and publish it to the in-memory index.
+    `version` is the embedding_version it was made with (current config if
+    None); it must match the version the index serves, otherwise a rollover
+    cut over while it was computed and ValueError is raised so it is redone.
+    """
+    from app.services.face_recognition_service import version_settings, embedding_version
+    version = version or embedding_version()
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE cases SET embedding = ?, embedding_dim = ?, embedding_model = ?, embedding_version = ? "
+        "WHERE id = ?",
+        (encode_embedding(embedding), len(embedding), version_settings(version)["model_name"], version, case_id),
+    )
+    # Checked while holding the write lock: a cutover commits under the same lock
+    serving = get_embedding_index().version
+    if version != serving:
+        conn.rollback()
+        conn.close()
+        raise ValueError(f"Embedding made with {version}, but scans now use {serving}")
+    cursor.execute(
+        "SELECT missing_full_name, gender, complainant_phone, age, missing_state, missing_city, image_hash "
+        "FROM cases WHERE id = ?", (case_id,)
+    )
+    row = cursor.fetchone()
+    if row is not None:
+        embedding_cache.put(row["image_hash"], version, embedding, conn=conn)
+    conn.commit()
+    conn.close()
+    if row is None:
+        return   # case was deleted while its embedding was being computed
+    embedding_index.upsert(case_id, embedding, _meta_from_row(row))
+    print(f"[CaseService] Embedding generated for case {case_id}")
 
 
 def save_case(data: dict, image_file):
     """
     Saves a missing person case to the database. Saves immediately with empty
-    embedding for fast response; generates embedding in background (~15-30s).
+    embedding for fast response; the embedding job is queued for the worker pool.
+    Raises QueueFull (and keeps nothing) if the embedding queue has no room.
     """
     # 1. Save the image file
     os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
@@ -37,18 +58,34 @@ def save_case(data: dict, image_file):
     image_path = os.path.join(config.UPLOAD_FOLDER, filename)
 
     with open(image_path, "wb") as buffer:
-        shutil.copyfileobj(image_file.file, buffer)
+        image_hash = copy_and_hash(image_file.file, buffer)
+
+    # Same photo embedded before: no inference at all, so no queue slot needed.
+    # Otherwise check for room before the case exists, so a turned-away report leaves nothing behind
+    version = get_embedding_index().version
+    cached  = embedding_cache.get(image_hash, version)
+    if cached is None:
+        try:
+            embedding_queue.wait_for_room()
+        except QueueFull:
+            os.remove(image_path)
+            raise
 
     # 2. Save to Database immediately (embedding = '' for now)
     conn = get_connection()
     cursor = conn.cursor()
-    
+
+    # The exact same photo was reported before: flag it for officers
+    cursor.execute("SELECT MIN(id) FROM cases WHERE image_hash = ?", (image_hash,))
+    duplicate_of = cursor.fetchone()[0]
+
     cursor.execute("""
         INSERT INTO cases (
             missing_full_name, gender, age, missing_state, missing_city, 
             pin_code, missing_date, missing_time, description, image_path, embedding,
-            complainant_name, relationship, complainant_phone, address_line1
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            complainant_name, relationship, complainant_phone, address_line1,
+            image_hash, duplicate_of
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (
         data.get("missing_full_name"),
         data.get("gender"),
@@ -64,29 +101,99 @@ def save_case(data: dict, image_file):
         data.get("complainant_name"),
         data.get("relationship"),
         data.get("complainant_phone"),
-        data.get("address_line1")
+        data.get("address_line1"),
+        image_hash,
+        duplicate_of,
     ))
     
     case_id = cursor.lastrowid
     conn.commit()
     conn.close()
+    if duplicate_of:
+        print(f"[CaseService] Case {case_id} uses the same photo as case {duplicate_of}")
 
-    # 3. Generate embedding in background (DeepFace takes 15-30s; user gets instant redirect)
-    thread = threading.Thread(
-        target=_generate_embedding_background,
-        args=(case_id, image_path),
-        daemon=True,
-    )
-    thread.start()
+    # 3. Same photo embedded before: reuse its embedding
+    if cached is not None:
+        try:
+            store_case_embedding(case_id, cached, version)
+            return case_id
+        except ValueError:
+            pass   # a rollover cut over just now; embed with the new version below
+
+    # 4. Queue embedding extraction (DeepFace takes 15-30s; user gets instant redirect)
+    try:
+        embedding_queue.enqueue(case_id, image_path)
+    except QueueFull:
+        # Filled up by concurrent reports since the check above: withdraw the case
+        delete_case(case_id)
+        os.remove(image_path)
+        raise
 
     return case_id
 
-def get_recent_cases(limit=10):
+
+# Everything the dashboard shows; never the embedding BLOB itself
+CASE_LIST_COLUMNS = """
+    id, missing_full_name, gender, age, missing_state, missing_city, pin_code,
+    missing_date, missing_time, image_path, complainant_name, complainant_phone,
+    status, created_at, duplicate_of, embedding_dim IS NOT NULL AS has_embedding
+"""
+
+
+def list_cases(limit=50, status=None, state=None, city=None, pin_code=None,
+               date_from=None, date_to=None, cursor=None):
+    """
+    Newest-first page of cases for the dashboard, filtered by status, region
+    (state / city, case-insensitive), PIN code and report date (YYYY-MM-DD,
+    inclusive). Keyset-paginated: pass the returned `next_cursor` back as
+    `cursor` for the following page, so deep pages cost the same as the first.
+
+    Returns (cases, next_cursor); next_cursor is None on the last page.
+    """
+    where, params = [], []
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    if state:
+        where.append("missing_state = ? COLLATE NOCASE")
+        params.append(state)
+    if city:
+        where.append("missing_city = ? COLLATE NOCASE")
+        params.append(city)
+    if pin_code:
+        where.append("pin_code = ?")
+        params.append(pin_code)
+    if date_from:
+        where.append("created_at >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("created_at < date(?, '+1 day')")
+        params.append(date_to)
+    if cursor:
+        created_at, _, last_id = cursor.rpartition("|")
+        where.append("(created_at, id) < (?, ?)")
+        params.extend([created_at, int(last_id)])
+
+    sql = f"SELECT {CASE_LIST_COLUMNS} FROM cases"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM cases ORDER BY created_at DESC LIMIT ?", (limit,))
-    cases = cursor.fetchall()
+    rows = conn.execute(sql, params).fetchall()
     conn.close()
+
+    cases = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = cases[-1]
+        next_cursor = f"{last['created_at']}|{last['id']}"
+    return cases, next_cursor
+
+
+def get_recent_cases(limit=10):
+    cases, _ = list_cases(limit=limit)
     return cases
 
 def get_case_by_id(case_id):
@@ -109,10 +216,12 @@ def delete_case(case_id):
         # Delete related comments first (foreign key from comments → cases)
         cursor.execute("DELETE FROM comments WHERE case_id = ?", (case_id,))
         comments_deleted = cursor.rowcount
+        cursor.execute("DELETE FROM embedding_jobs WHERE case_id = ?", (case_id,))
         # Then delete the case
         cursor.execute("DELETE FROM cases WHERE id = ?", (case_id,))
         rows_affected = cursor.rowcount
         conn.commit()
+        embedding_index.remove(case_id)
         print(f"[DEBUG] CaseService.delete_case finished. Comments deleted: {comments_deleted}, Case rows: {rows_affected}")
         return rows_affected
     except Exception as e:
@@ -0,0 +1,156 @@
+import os
+import time
+import hashlib
+import threading
+
+from app.models.database import get_connection, encode_embedding, decode_embedding
+from app.config import config
+
+HASH_CHUNK  = 1024 * 1024   # bytes read per hashing step
+EVICT_EVERY = 64            # puts between size checks
+EVICT_SLACK = 0.1           # evict down to 90% of the limit so the next puts don't evict again
+
+
+def copy_and_hash(src, dst) -> str:
+    """Copy file object `src` to `dst` and return the sha256 of the bytes copied."""
+    digest = hashlib.sha256()
+    while True:
+        chunk = src.read(HASH_CHUNK)
+        if not chunk:
+            return digest.hexdigest()
+        digest.update(chunk)
+        dst.write(chunk)
+
+
+def hash_file(path: str):
+    """sha256 of a stored photo, or None if it is missing."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def backfill_image_hashes(cases: list):
+    """
+    Hash the photos of cases stored before image_hash existed. `cases` are
+    dicts with id, image_path (relative to UPLOAD_FOLDER) and image_hash;
+    they are updated in place and in the cases table.
+    """
+    missing = [case for case in cases if not case["image_hash"]]
+    for case in missing:
+        case["image_hash"] = hash_file(os.path.join(config.UPLOAD_FOLDER, case["image_path"]))
+    updates = [(case["image_hash"], case["id"]) for case in missing if case["image_hash"]]
+    if updates:
+        conn = get_connection()
+        conn.executemany("UPDATE cases SET image_hash = ? WHERE id = ?", updates)
+        conn.commit()
+        conn.close()
+
+
+class EmbeddingCache:
+    """
+    Persistent photo-embedding cache keyed by (sha256 of the image bytes,
+    embedding_version), in the `embedding_cache` table.
+
+    A photo that was embedded before — a duplicate report, a relative
+    re-submitting the same picture, an unchanged file during a re-embed or
+    rollover — is served from here instead of running detection + ArcFace
+    again. The table is kept to about `max_entries` rows (checked every
+    EVICT_EVERY inserts), least recently used rows evicted first.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits        = 0
+        self.misses      = 0
+        self._puts       = 0
+        self._lock       = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, image_hash: str, version: str):
+        """Cached embedding (float32 vector) for a photo, or None."""
+        if not image_hash:
+            return None
+        return self.get_many([image_hash], version).get(image_hash)
+
+    def get_many(self, image_hashes: list, version: str) -> dict:
+        """{image_hash: embedding} for every hash that is cached at `version`."""
+        hashes = list({h for h in image_hashes if h})
+        if not self.enabled or not hashes:
+            return {}
+        found = {}
+        conn  = get_connection()
+        for start in range(0, len(hashes), 500):   # stay under SQLite's bound-parameter limit
+            chunk = hashes[start:start + 500]
+            rows  = conn.execute(
+                f"SELECT image_hash, embedding FROM embedding_cache "
+                f"WHERE embedding_version = ? AND image_hash IN ({','.join('?' * len(chunk))})",
+                [version, *chunk],
+            ).fetchall()
+            found.update((row["image_hash"], decode_embedding(row["embedding"])) for row in rows)
+        if found:
+            conn.executemany(
+                "UPDATE embedding_cache SET last_used = ? WHERE image_hash = ? AND embedding_version = ?",
+                [(time.time(), h, version) for h in found],
+            )
+            conn.commit()
+        conn.close()
+        with self._lock:
+            self.hits   += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put(self, image_hash: str, version: str, embedding, conn=None):
+        """Cache an embedding; with `conn` the write joins the caller's transaction."""
+        self.put_many([(image_hash, embedding)], version, conn)
+
+    def put_many(self, items: list, version: str, conn=None):
+        """Cache [(image_hash, embedding)] pairs (entries without a hash are skipped)."""
+        rows = [
+            (h, version, encode_embedding(emb), len(emb), time.time())
+            for h, emb in items if h and emb is not None
+        ]
+        if not self.enabled or not rows:
+            return
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embedding_cache "
+            "(image_hash, embedding_version, embedding, embedding_dim, last_used) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        with self._lock:
+            self._puts += len(rows)
+            check = self._puts >= EVICT_EVERY
+            if check:
+                self._puts = 0
+        if check:
+            self._evict(conn)
+        if own_conn:
+            conn.commit()
+            conn.close()
+
+    def _evict(self, conn):
+        size   = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        excess = size - int(self.max_entries * (1 - EVICT_SLACK))
+        if size <= self.max_entries or excess <= 0:
+            return
+        conn.execute(
+            "DELETE FROM embedding_cache WHERE rowid IN "
+            "(SELECT rowid FROM embedding_cache ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        print(f"[EmbeddingCache] Evicted {excess} least recently used embedding(s)")
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "max_entries": self.max_entries}
+
+
+embedding_cache = EmbeddingCache(max_entries=config.EMBEDDING_CACHE_SIZE)
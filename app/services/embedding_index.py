@@ -0,0 +1,458 @@
+import os
+import threading
+from collections import Counter
+from dataclasses import dataclass
+import numpy as np
+
+from app.models.database import get_connection, decode_embedding, DB_PATH
+from app.config import config
+
+
+# Per-row case attributes used for prefiltering (0 / NaN = unknown, which always passes a filter)
+ATTR_DTYPE = np.dtype([("state", "<i4"), ("city", "<i4"), ("gender", "i1"), ("age", "<f4")])
+UNKNOWN_ATTRS = np.array([(0, 0, 0, np.nan)], dtype=ATTR_DTYPE)[0]
+
+GENDER_CODES = {"male": 1, "m": 1, "female": 2, "f": 2}
+OTHER_GENDER = 3
+
+
+class _VectorBlock:
+    """Growable float32 matrix of unit vectors plus their case ids and attributes (O(1) append/remove)."""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.ids     = np.empty(capacity, dtype=np.int64)
+        self.attrs   = np.empty(capacity, dtype=ATTR_DTYPE)
+        self.size    = 0
+
+    @classmethod
+    def from_arrays(cls, vectors: np.ndarray, ids: np.ndarray, attrs: np.ndarray = None) -> "_VectorBlock":
+        block = cls(vectors.shape[1], capacity=max(16, 2 * len(vectors)))
+        block.vectors[:len(vectors)] = vectors
+        block.ids[:len(ids)]         = ids
+        block.attrs[:len(ids)]       = attrs if attrs is not None else UNKNOWN_ATTRS
+        block.size = len(vectors)
+        return block
+
+    def append(self, case_id: int, vec, attrs=UNKNOWN_ATTRS) -> int:
+        if self.size == self.vectors.shape[0]:
+            capacity = self.vectors.shape[0] * 2
+            vectors  = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            ids      = np.empty(capacity, dtype=np.int64)
+            rows     = np.empty(capacity, dtype=ATTR_DTYPE)
+            vectors[:self.size] = self.vectors[:self.size]
+            ids[:self.size]     = self.ids[:self.size]
+            rows[:self.size]    = self.attrs[:self.size]
+            self.vectors, self.ids, self.attrs = vectors, ids, rows
+        row = self.size
+        self.vectors[row] = vec
+        self.ids[row]     = case_id
+        self.attrs[row]   = attrs
+        self.size += 1
+        return row
+
+    def remove(self, row: int):
+        """Swap the last row into `row`; returns the case id that moved (or None)."""
+        last = self.size - 1
+        moved_id = None
+        if row != last:
+            moved_id = int(self.ids[last])
+            self.vectors[row] = self.vectors[last]
+            self.ids[row]     = moved_id
+            self.attrs[row]   = self.attrs[last]
+        self.size -= 1
+        return moved_id
+
+    def candidates(self, Q: np.ndarray, case_filter: "_ResolvedFilter" = None):
+        """
+        Distances (probes × rows) and ids of the rows passing `case_filter`;
+        filtered-out rows are dropped before the matrix product.
+        """
+        if case_filter is None:
+            return 1.0 - Q @ self.vectors[:self.size].T, self.ids[:self.size]
+        rows = np.flatnonzero(case_filter.mask(self.attrs[:self.size]))
+        return 1.0 - Q @ self.vectors[rows].T, self.ids[rows]
+
+
+@dataclass(frozen=True)
+class CaseFilter:
+    """
+    Optional narrowing of a scan to plausible cases: report states / cities
+    (e.g. the camera's region), gender and an age band. Cases whose value is
+    unknown are never filtered out on that attribute.
+    """
+    states:  tuple = ()
+    cities:  tuple = ()
+    gender:  str   = None
+    age_min: float = None
+    age_max: float = None
+
+    def __bool__(self):
+        return bool(self.states or self.cities or self.gender or
+                    self.age_min is not None or self.age_max is not None)
+
+    @classmethod
+    def from_dict(cls, data) -> "CaseFilter":
+        """Build from a JSON body / query-string dict; lists may also be comma-separated strings."""
+        if not data:
+            return cls()
+
+        def _names(value):
+            if isinstance(value, str):
+                value = value.split(",")
+            return tuple(sorted({_norm(v) for v in value or () if _norm(v)}))
+
+        def _number(value):
+            return float(value) if value not in (None, "") else None
+
+        return cls(
+            states=_names(data.get("states") or data.get("state")),
+            cities=_names(data.get("cities") or data.get("city")),
+            gender=_norm(data.get("gender")) or None,
+            age_min=_number(data.get("age_min")),
+            age_max=_number(data.get("age_max")),
+        )
+
+    def key(self) -> str:
+        """Stable text form (e.g. to keep per-filter caches apart)."""
+        return repr(self) if self else ""
+
+
+class _ResolvedFilter:
+    """A CaseFilter translated to the index's integer codes."""
+
+    def __init__(self, states, cities, gender, age_min, age_max):
+        self.states  = states    # np.ndarray of codes, or None for "any"
+        self.cities  = cities
+        self.gender  = gender
+        self.age_min = age_min
+        self.age_max = age_max
+
+    def mask(self, attrs: np.ndarray) -> np.ndarray:
+        keep = np.ones(len(attrs), dtype=bool)
+        if self.states is not None:
+            keep &= np.isin(attrs["state"], self.states) | (attrs["state"] == 0)
+        if self.cities is not None:
+            keep &= np.isin(attrs["city"], self.cities) | (attrs["city"] == 0)
+        if self.gender:
+            keep &= (attrs["gender"] == self.gender) | (attrs["gender"] == 0)
+        if self.age_min is not None:
+            keep &= ~(attrs["age"] < self.age_min)   # NaN (unknown age) passes
+        if self.age_max is not None:
+            keep &= ~(attrs["age"] > self.age_max)
+        return keep
+
+
+class EmbeddingIndex:
+    """
+    Process-wide in-memory index of case embeddings.
+
+    Every vector is L2-normalised once on insert and kept in contiguous
+    float32 blocks, so matching a probe is a matrix-vector product instead
+    of a JSON parse + cosine call per case on every frame. Cases are
+    partitioned into one block per reported state, so a scan filtered to a
+    region only touches that region's sub-index; gender / age filters drop
+    rows inside a block before the product.
+    """
+
+    def __init__(self):
+        self._lock   = threading.RLock()
+        self._meta   = {}    # case_id -> {"name", "gender", "complainant_phone", "age", "state", "city"}
+        self._codes  = {}    # normalised state / city name -> attribute code (0 = unknown)
+        self.version = None  # embedding_version of the vectors served; probes must match it
+        self.loaded  = False
+        self._reset()
+
+    def _reset(self):
+        self._dim       = None
+        self._blocks    = {}    # state code -> _VectorBlock
+        self._positions = {}    # case_id -> (state code, row)
+
+    def __len__(self):
+        return len(self._positions)
+
+    # ── Loading ───────────────────────────────────────────────────────────────
+    def load_from_db(self, staging_version: str = None, conn=None):
+        """
+        (Re)build the whole index from the cases table. With `staging_version`,
+        build the next version's index instead: staged embeddings replace the
+        stored ones (see embedding_rollover.py). `conn` lets a caller load
+        inside its own transaction.
+        """
+        from app.services.face_recognition_service import EMBEDDING_VERSION
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        rows = _index_rows(conn, staging_version)
+        if own_conn:
+            conn.close()
+
+        # Serve whichever version most stored embeddings have; a config change
+        # is rolled out by embedding_rollover without mixing spaces in one index
+        versions = Counter(row["embedding_version"] for row in rows if isinstance(row["embedding"], bytes))
+        version  = staging_version or (versions.most_common(1)[0][0] if versions else EMBEDDING_VERSION)
+
+        with self._lock:
+            self._reset()
+            self._meta   = {}
+            self.version = version
+            for row in rows:
+                if not isinstance(row["embedding"], bytes) or row["embedding_version"] != version:
+                    continue   # not embedded (yet), pre-migration JSON, or another version
+                self.upsert(row["id"], decode_embedding(row["embedding"]), _meta_from_row(row))
+            self._after_load()
+            self.loaded = True
+        print(f"[EmbeddingIndex] Loaded {len(self)} case embedding(s) at {version} ({type(self).__name__})")
+
+    def sync_from_db(self, staging_version: str, conn) -> int:
+        """
+        Catch an index built by load_from_db(staging_version) up with the
+        database: add cases staged or embedded at that version since the
+        build, drop cases deleted since. Only ids are compared and only the
+        changed rows are read, so this is cheap enough to run inside the
+        rollover cutover's write transaction. Returns the rows changed.
+        """
+        current = {row[0] for row in conn.execute(
+            "SELECT s.case_id FROM embedding_staging s JOIN cases c ON c.id = s.case_id "
+            "WHERE s.embedding_version = ? AND s.embedding IS NOT NULL "
+            "UNION SELECT id FROM cases WHERE embedding_version = ? AND embedding != '' AND id NOT IN "
+            "(SELECT case_id FROM embedding_staging WHERE embedding_version = ?)",
+            (staging_version,) * 3,
+        )}
+        with self._lock:
+            known = set(self._meta)
+        added, removed = sorted(current - known), known - current
+        for start in range(0, len(added), 500):   # stay under SQLite's bound-parameter limit
+            for row in _index_rows(conn, staging_version, added[start:start + 500]):
+                if isinstance(row["embedding"], bytes):
+                    self.upsert(row["id"], decode_embedding(row["embedding"]), _meta_from_row(row))
+        for case_id in removed:
+            self.remove(case_id)
+        return len(added) + len(removed)
+
+    def adopt(self, other: "EmbeddingIndex"):
+        """Atomically take over another (fully built) index's contents; searches never see a mix."""
+        with self._lock:
+            state = dict(vars(other))
+            state.pop("_lock")
+            self.__dict__.update(state)
+
+    def _after_load(self):
+        pass
+
+    # ── Mutation ──────────────────────────────────────────────────────────────
+    def upsert(self, case_id: int, embedding, meta: dict = None):
+        """Insert or replace the vector for `case_id`."""
+        vec = _normalise(embedding)
+        if vec is None:
+            return
+        with self._lock:
+            self._check_dim(vec, f"Embedding for case {case_id}")
+            if meta is None:
+                meta = self._meta.get(case_id, {})
+            self._insert(case_id, vec, self._attrs(meta))
+            self._meta[case_id] = meta
+
+    def remove(self, case_id: int) -> bool:
+        """Drop `case_id` from the index."""
+        with self._lock:
+            if not self._delete(case_id):
+                return False
+            self._meta.pop(case_id, None)
+            return True
+
+    def _check_dim(self, vec: np.ndarray, what: str):
+        if self._dim is None:
+            self._dim = vec.shape[0]
+        if vec.shape[0] != self._dim:
+            raise ValueError(f"{what} has {vec.shape[0]} dims, index has {self._dim}")
+
+    def _code(self, name) -> int:
+        """Attribute code for a state / city name, allocating one for new names."""
+        name = _norm(name)
+        if not name:
+            return 0
+        return self._codes.setdefault(name, len(self._codes) + 1)
+
+    def _attrs(self, meta: dict):
+        gender = _norm(meta.get("gender"))
+        try:
+            age = float(meta.get("age"))
+        except (TypeError, ValueError):
+            age = np.nan
+        return (
+            self._code(meta.get("state")),
+            self._code(meta.get("city")),
+            GENDER_CODES.get(gender, OTHER_GENDER if gender else 0),
+            age,
+        )
+
+    def _insert(self, case_id: int, vec: np.ndarray, attrs):
+        self._delete(case_id)   # the case may have moved partition
+        part  = attrs[0]
+        block = self._blocks.get(part)
+        if block is None:
+            block = self._blocks[part] = _VectorBlock(self._dim)
+        self._positions[case_id] = (part, block.append(case_id, vec, attrs))
+
+    def _delete(self, case_id: int) -> bool:
+        position = self._positions.pop(case_id, None)
+        if position is None:
+            return False
+        part, row = position
+        moved_id = self._blocks[part].remove(row)
+        if moved_id is not None:
+            self._positions[moved_id] = (part, row)
+        return True
+
+    # ── Search ────────────────────────────────────────────────────────────────
+    def search(self, probe_embedding, k: int = None, max_distance: float = None,
+               case_filter: CaseFilter = None) -> list:
+        """
+        Return the closest cases to `probe_embedding`, best first, as dicts with
+        case_id, distance and the stored case metadata.
+        """
+        return self.search_batch([probe_embedding], k, max_distance, case_filter)[0]
+
+    def search_batch(self, probe_embeddings: list, k: int = None, max_distance: float = None,
+                     case_filter: CaseFilter = None) -> list:
+        """Like search() for several probes at once (one matrix-matrix product); one list per probe."""
+        probes = [_normalise(p) for p in probe_embeddings]
+        valid  = [i for i, q in enumerate(probes) if q is not None]
+        out    = [[] for _ in probes]
+        with self._lock:
+            if len(self) == 0 or not valid:
+                return out
+            Q = np.stack([probes[i] for i in valid])
+            self._check_dim(Q[0], "Probe")
+            resolved = self._resolve(case_filter)
+            for i, (distances, ids) in zip(valid, self._candidates_batch(Q, resolved)):
+                out[i] = self._select(distances, ids, k, max_distance)
+        return out
+
+    def _resolve(self, case_filter: CaseFilter):
+        if not case_filter:
+            return None
+
+        def _codes(names):
+            if not names:
+                return None
+            # Names never seen in any case get no code, so only unknown-region cases pass
+            return np.array([self._codes[n] for n in names if n in self._codes], dtype=np.int32)
+
+        gender = None
+        if case_filter.gender:
+            gender = GENDER_CODES.get(case_filter.gender, OTHER_GENDER)
+        return _ResolvedFilter(_codes(case_filter.states), _codes(case_filter.cities),
+                               gender, case_filter.age_min, case_filter.age_max)
+
+    def _candidates_batch(self, Q: np.ndarray, case_filter: _ResolvedFilter = None) -> list:
+        """(distances, case ids) of every vector each probe in `Q` should consider."""
+        if case_filter is not None and case_filter.states is not None:
+            parts = [0, *case_filter.states.tolist()]   # the region's sub-indexes + unknown-region cases
+        else:
+            parts = list(self._blocks)
+        blocks = [self._blocks[p] for p in parts if p in self._blocks and self._blocks[p].size]
+        if not blocks:
+            return [(np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)) for _ in Q]
+
+        results   = [block.candidates(Q, case_filter) for block in blocks]
+        distances = np.concatenate([d for d, _ in results], axis=1)
+        ids       = np.concatenate([i for _, i in results])
+        return [(row, ids) for row in distances]
+
+    def _select(self, distances, ids, k, max_distance) -> list:
+        if max_distance is not None:
+            keep = np.flatnonzero(distances < max_distance)
+        else:
+            keep = np.arange(len(distances))
+        if k is not None and len(keep) > k:
+            keep = keep[np.argpartition(distances[keep], k - 1)[:k]]
+        keep = keep[np.argsort(distances[keep], kind="stable")]
+
+        results = []
+        for i in keep:
+            case_id = int(ids[i])
+            results.append({
+                "case_id":  case_id,
+                "distance": float(distances[i]),
+                **self._meta.get(case_id, {}),
+            })
+        return results
+
+
+def _normalise(embedding):
+    vec  = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        return None
+    return vec / norm
+
+
+def _norm(value) -> str:
+    return str(value).strip().casefold() if value is not None else ""
+
+
+def _index_rows(conn, staging_version: str = None, ids: list = None) -> list:
+    """
+    Case rows (id, match metadata, embedding, embedding_version) an index is
+    built from: stored embeddings, or with `staging_version` the staged
+    embeddings plus cases already at that version. `ids` limits the rows.
+    """
+    columns = "c.id, c.missing_full_name, c.gender, c.complainant_phone, c.age, c.missing_state, c.missing_city"
+    if staging_version:
+        sql = (
+            f"SELECT {columns}, COALESCE(s.embedding, '') AS embedding, ? AS embedding_version "
+            "FROM cases c JOIN embedding_staging s ON s.case_id = c.id AND s.embedding_version = ? "
+            f"UNION ALL SELECT {columns}, c.embedding, c.embedding_version FROM cases c "
+            "WHERE c.embedding_version = ? AND c.id NOT IN "
+            "(SELECT case_id FROM embedding_staging WHERE embedding_version = ?)"
+        )
+        params = [staging_version] * 4
+    else:
+        sql    = f"SELECT {columns}, c.embedding, c.embedding_version FROM cases c WHERE c.embedding != ''"
+        params = []
+    if ids is not None:
+        sql = f"SELECT * FROM ({sql}) WHERE id IN ({','.join('?' * len(ids))})"
+        params += list(ids)
+    return conn.execute(sql, params).fetchall()
+
+
+def _meta_from_row(row) -> dict:
+    return {
+        "name":              row["missing_full_name"],
+        "gender":            row["gender"],
+        "complainant_phone": row["complainant_phone"],
+        "age":               row["age"],
+        "state":             row["missing_state"],
+        "city":              row["missing_city"],
+    }
+
+
+# ── Process-wide singleton ────────────────────────────────────────────────────
+# exact: brute-force matrix product (default) | ivf: approximate, see ann_index.py
+IVF_INDEX_PATH = os.path.splitext(DB_PATH)[0] + ".ivf.npz"
+
+
+def create_index() -> EmbeddingIndex:
+    """Build an empty index for the configured EMBEDDING_INDEX_BACKEND."""
+    backend = config.EMBEDDING_INDEX_BACKEND
+    if backend == "ivf":
+        from app.services.ann_index import IVFIndex
+        return IVFIndex(nlist=config.IVF_NLIST, nprobe=config.IVF_NPROBE, path=IVF_INDEX_PATH)
+    if backend != "exact":
+        print(f"[EmbeddingIndex] Unknown backend '{backend}', falling back to exact search")
+    return EmbeddingIndex()
+
+
+embedding_index = create_index()
+_load_lock      = threading.Lock()
+
+
+def get_embedding_index() -> EmbeddingIndex:
+    """Return the shared index, loading it from the database on first use."""
+    if not embedding_index.loaded:
+        with _load_lock:
+            if not embedding_index.loaded:
+                embedding_index.load_from_db()
+    return embedding_index
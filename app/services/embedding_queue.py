@@ -0,0 +1,253 @@
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.models.database import get_connection
+from app.config import config
+from app.services.embedding_index import get_embedding_index
+from app.services.metrics import EMBEDDING_JOBS_TOTAL
+
+MAX_ATTEMPTS     = 3     # a job is marked 'failed' after this many errors
+RETRY_BASE_DELAY = 5.0   # seconds; doubles on every retry
+POLL_INTERVAL    = 1.0   # seconds between DB polls when idle
+JOBS_PER_BATCH   = 8     # reports embedded together in one ArcFace forward pass
+ENQUEUE_WAIT     = 2.0   # seconds enqueue() waits for room in a full queue before QueueFull
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Worker-process side
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _init_worker():
+    """Runs once per worker process: import TensorFlow and build ArcFace up front."""
+    from app.services.face_recognition_service import get_deepface, MODEL_NAME
+    get_deepface().build_model(MODEL_NAME)
+
+
+def _embed_images(image_paths: list, version: str = None) -> list:
+    """
+    One batched ArcFace pass over several reports; returns an embedding (or
+    None) per path, made with the pipeline of `version` (current if None).
+    """
+    from app.services.face_recognition_service import get_embeddings_batch, version_settings
+    return [
+        faces[0]["embedding"] if faces else None
+        for faces in get_embeddings_batch(image_paths, **version_settings(version))
+    ]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Queue / dispatcher (runs in the web process)
+# ─────────────────────────────────────────────────────────────────────────────
+
+class QueueFull(Exception):
+    """The queue already holds `max_depth` pending/running jobs; try again later."""
+
+
+class EmbeddingJobQueue:
+    """
+    Durable embedding job queue served by a fixed pool of worker processes.
+
+    Jobs live in the `embedding_jobs` table, so a burst of reports simply
+    grows the backlog instead of spawning one TensorFlow inference per
+    report: the dispatcher hands workers batches of up to JOBS_PER_BATCH
+    reports and only keeps `max_in_flight` batches inside the pool at a
+    time. Failed jobs are retried with exponential backoff, and jobs left
+    'running' by a crash or restart are resumed on the next start().
+
+    The backlog itself is capped at `max_depth` jobs (0 = unbounded): a
+    report arriving while it is full waits up to ENQUEUE_WAIT seconds for
+    room, then gets QueueFull instead of growing the queue without limit.
+    """
+
+    def __init__(self, workers: int, max_depth: int = 0):
+        self.workers       = max(1, workers)
+        self.max_depth     = max(0, max_depth)
+        self.max_in_flight = self.workers * 2
+        self._executor     = None
+        self._thread       = None
+        self._stop         = threading.Event()
+        self._wake         = threading.Event()
+        self._pool_broken  = threading.Event()
+        self._slots        = threading.BoundedSemaphore(self.max_in_flight)
+
+    # ── Public API ────────────────────────────────────────────────────────────
+    def enqueue(self, case_id: int, image_path: str) -> int:
+        """
+        Persist a job for `case_id`; it is picked up as soon as a worker is
+        free. Raises QueueFull if the queue stays full for ENQUEUE_WAIT seconds.
+        """
+        self.wait_for_room()
+        conn   = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO embedding_jobs (case_id, image_path) VALUES (?, ?)",
+            (case_id, image_path),
+        )
+        job_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        self._wake.set()
+        return job_id
+
+    def wait_for_room(self, timeout: float = ENQUEUE_WAIT):
+        """Block until the queue is below `max_depth`; QueueFull after `timeout` seconds."""
+        if not self.max_depth:
+            return
+        deadline = time.monotonic() + timeout
+        while self.depth() >= self.max_depth:
+            if time.monotonic() >= deadline:
+                raise QueueFull(f"{self.max_depth} embedding jobs already queued")
+            time.sleep(0.25)
+
+    def depth(self) -> int:
+        """Number of jobs waiting or being processed."""
+        conn = get_connection()
+        row  = conn.execute(
+            "SELECT COUNT(*) FROM embedding_jobs WHERE status IN ('pending', 'running')"
+        ).fetchone()
+        conn.close()
+        return row[0]
+
+    def start(self):
+        if self._thread is not None:
+            return
+        conn = get_connection()
+        resumed = conn.execute(
+            "UPDATE embedding_jobs SET status = 'pending', updated_at = CURRENT_TIMESTAMP "
+            "WHERE status = 'running'"
+        ).rowcount
+        conn.commit()
+        conn.close()
+        if resumed:
+            print(f"[EmbeddingQueue] Resuming {resumed} interrupted job(s)")
+
+        self._stop.clear()
+        self._executor = self._new_executor()
+        self._thread   = threading.Thread(target=self._dispatch_loop, name="embedding-dispatcher", daemon=True)
+        self._thread.start()
+        print(f"[EmbeddingQueue] Started with {self.workers} worker process(es)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._executor is not None:
+            # Unfinished jobs stay 'running' in the DB and are resumed on next start()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ── Dispatcher ────────────────────────────────────────────────────────────
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),   # TensorFlow is not fork-safe
+            initializer=_init_worker,
+        )
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            if self._pool_broken.is_set():
+                print("[EmbeddingQueue] Worker pool crashed, restarting it")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                self._pool_broken.clear()
+            dispatched = 0
+            while not self._stop.is_set() and self._slots.acquire(blocking=False):
+                jobs = self._claim_jobs(JOBS_PER_BATCH)
+                if not jobs:
+                    self._slots.release()
+                    break
+                self._submit(jobs)
+                dispatched += 1
+            if not dispatched:
+                self._wake.wait(POLL_INTERVAL)
+
+    def _claim_jobs(self, limit: int) -> list:
+        conn = get_connection()
+        try:
+            rows = conn.execute(
+                "SELECT id, case_id, image_path, attempts FROM embedding_jobs "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE embedding_jobs SET status = 'running', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                [(row["id"],) for row in rows],
+            )
+            conn.commit()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def _submit(self, jobs: list):
+        try:
+            # Embed with the version scans currently match against (see embedding_rollover.py)
+            version = get_embedding_index().version
+            future  = self._executor.submit(_embed_images, [job["image_path"] for job in jobs], version)
+        except BrokenProcessPool as e:
+            self._slots.release()
+            self._pool_broken.set()
+            for job in jobs:
+                self._job_failed(job, e)
+            return
+        future.add_done_callback(lambda f, jobs=jobs, version=version: self._on_done(jobs, version, f))
+
+    def _on_done(self, jobs: list, version: str, future):
+        self._slots.release()
+        self._wake.set()
+        if future.cancelled():
+            return   # shutting down; jobs are resumed on next start()
+        try:
+            embeddings = future.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._pool_broken.set()
+            for job in jobs:
+                self._job_failed(job, e)
+            return
+
+        from app.services.case_service import store_case_embedding
+        for job, embedding in zip(jobs, embeddings):
+            try:
+                if not embedding:
+                    raise ValueError("Face could not be detected")
+                store_case_embedding(job["case_id"], embedding, version)
+            except Exception as e:
+                self._job_failed(job, e)
+                continue
+            EMBEDDING_JOBS_TOTAL.inc(result="ok")
+            conn = get_connection()
+            conn.execute("DELETE FROM embedding_jobs WHERE id = ?", (job["id"],))
+            conn.commit()
+            conn.close()
+
+    def _job_failed(self, job: dict, error: Exception):
+        EMBEDDING_JOBS_TOTAL.inc(result="error")
+        attempts = job["attempts"] + 1
+        conn = get_connection()
+        if attempts >= MAX_ATTEMPTS:
+            conn.execute(
+                "UPDATE embedding_jobs SET status = 'failed', attempts = ?, last_error = ?, "
+                "updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (attempts, str(error), job["id"]),
+            )
+            print(f"[EmbeddingQueue] Case {job['case_id']}: giving up after {attempts} attempt(s): {error}")
+        else:
+            delay = RETRY_BASE_DELAY * 2 ** (attempts - 1)
+            conn.execute(
+                "UPDATE embedding_jobs SET status = 'pending', attempts = ?, last_error = ?, "
+                "next_attempt_at = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (attempts, str(error), time.time() + delay, job["id"]),
+            )
+            print(f"[EmbeddingQueue] Case {job['case_id']}: attempt {attempts} failed ({error}); retrying in {delay:.0f}s")
+        conn.commit()
+        conn.close()
+
+
+embedding_queue = EmbeddingJobQueue(workers=config.EMBEDDING_WORKERS, max_depth=config.EMBEDDING_QUEUE_MAX)
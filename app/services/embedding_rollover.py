@@ -0,0 +1,266 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app.models.database import get_connection, encode_embedding
+from app.config import config
+from app.services.embedding_index import get_embedding_index, create_index, embedding_index
+from app.services.embedding_queue import _init_worker
+from app.services.embedding_cache import embedding_cache, backfill_image_hashes
+
+JOBS_PER_BATCH   = 16    # photos per worker task (one batched ArcFace pass)
+RETRY_DELAY      = 30.0  # seconds to back off after a worker pool failure
+STATUS_EVERY     = 30.0  # seconds between progress lines
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Worker-process side
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _embed_staged(image_paths: list, version: str) -> list:
+    """Embed photos with the pipeline of `version`; an embedding (or None) per path."""
+    from app.services.face_recognition_service import (
+        get_embeddings_batch, detect_faces, embed_faces, version_settings,
+    )
+    settings = version_settings(version)
+    results  = []
+    for path, faces in zip(image_paths, get_embeddings_batch(image_paths, **settings)):
+        if faces:
+            results.append(faces[0]["embedding"])
+            continue
+        # The new detector missed a face the old one found: keep the case
+        # matchable with a whole-image embedding rather than dropping it
+        try:
+            crops = detect_faces(path, enforce_detection=False, **settings)
+            results.append(embed_faces(crops[:1], settings["model_name"])[0].tolist())
+        except Exception as e:
+            print(f"[EmbeddingRollover] Could not embed {path}: {e}")
+            results.append(None)
+    return results
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Rollover driver (runs in the web process)
+# ─────────────────────────────────────────────────────────────────────────────
+
+class EmbeddingRollover:
+    """
+    Zero-downtime switch to a new embedding version (MODEL_NAME /
+    DETECTOR_CASCADE / alignment change).
+
+    At startup the index keeps serving the version most stored embeddings
+    were made with, and scans and new reports keep using that version's
+    pipeline. Meanwhile a background thread re-embeds every case with the
+    configured version into `embedding_staging`, in its own worker pool.
+    Once every case is staged, one write transaction builds the new index,
+    copies the staged embeddings into `cases` and swaps the in-memory index
+    in place, so scans go straight from the complete old index to the
+    complete new one. Staged rows survive restarts, so an interrupted
+    rollover resumes where it stopped.
+    """
+
+    def __init__(self, workers: int):
+        self.workers   = workers
+        self.target    = None
+        self.state     = "idle"     # idle | running | done | disabled
+        self.staged    = 0
+        self.remaining = 0
+        self._thread   = None
+        self._stop     = threading.Event()
+
+    # ── Public API ────────────────────────────────────────────────────────────
+    def start(self):
+        from app.services.face_recognition_service import EMBEDDING_VERSION
+        if self._thread is not None:
+            return
+        self.target = EMBEDDING_VERSION
+        serving     = get_embedding_index().version
+
+        conn = get_connection()
+        conn.execute("DELETE FROM embedding_staging WHERE embedding_version != ?", (self.target,))
+        conn.commit()
+        self.remaining = len(self._pending(conn))
+        conn.close()
+
+        if serving == self.target and not self.remaining:
+            return
+        if self.workers <= 0:
+            self.state = "disabled"
+            print(f"[EmbeddingRollover] Serving {serving} but config is {self.target}; "
+                  f"ROLLOVER_WORKERS=0, run reembed_cases.py and restart to switch")
+            return
+
+        print(f"[EmbeddingRollover] Re-embedding {self.remaining} case(s) {serving} -> {self.target} "
+              f"with {self.workers} worker(s); scans keep using {serving} until cutover")
+        self.state = "running"
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="embedding-rollover", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def status(self) -> dict:
+        return {
+            "state":     self.state,
+            "serving":   embedding_index.version,
+            "target":    self.target,
+            "staged":    self.staged,
+            "remaining": self.remaining,
+        }
+
+    # ── Background loop ───────────────────────────────────────────────────────
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),   # TensorFlow is not fork-safe
+            initializer=_init_worker,
+        )
+
+    def _run(self):
+        executor, last_status = self._new_executor(), 0.0
+        try:
+            while not self._stop.is_set():
+                conn = get_connection()
+                rows = self._pending(conn, limit=JOBS_PER_BATCH * self.workers * 2)
+                conn.close()
+                if not rows:
+                    try:
+                        if self._cutover():
+                            self.state = "done"
+                            return
+                    except Exception as e:
+                        print(f"[EmbeddingRollover] Cutover failed ({e}); retrying in {RETRY_DELAY:.0f}s")
+                        self._stop.wait(RETRY_DELAY)
+                    continue   # a report arrived after the last batch; stage it first
+
+                # Photos already embedded at the target version (duplicates, earlier runs) skip inference
+                rows = [dict(row) for row in rows]
+                backfill_image_hashes(rows)
+                cached = embedding_cache.get_many([row["image_hash"] for row in rows], self.target)
+                hits   = [row for row in rows if row["image_hash"] in cached]
+                if hits:
+                    self._stage(hits, [cached[row["image_hash"]] for row in hits])
+                todo = [row for row in rows if row["image_hash"] not in cached]
+
+                batches = [todo[i:i + JOBS_PER_BATCH] for i in range(0, len(todo), JOBS_PER_BATCH)]
+                try:
+                    futures = [
+                        executor.submit(
+                            _embed_staged,
+                            [os.path.join(config.UPLOAD_FOLDER, row["image_path"]) for row in batch],
+                            self.target,
+                        )
+                        for batch in batches
+                    ]
+                    for batch, future in zip(batches, futures):
+                        self._stage(batch, future.result())
+                except Exception as e:
+                    print(f"[EmbeddingRollover] Worker pool failed ({e}); retrying in {RETRY_DELAY:.0f}s")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    if self._stop.wait(RETRY_DELAY):
+                        return
+                    executor = self._new_executor()
+                    continue
+
+                self.remaining = max(0, self.remaining - len(rows))
+                if time.time() - last_status >= STATUS_EVERY:
+                    last_status = time.time()
+                    print(f"[EmbeddingRollover] {self.staged} staged, ~{self.remaining} remaining")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _pending(self, conn, limit: int = -1) -> list:
+        """Embedded cases not at the target version that have no staged embedding yet."""
+        return conn.execute(
+            "SELECT c.id, c.image_path, c.image_hash FROM cases c "
+            "WHERE c.embedding_dim IS NOT NULL AND c.embedding_version IS NOT ? "
+            "AND NOT EXISTS (SELECT 1 FROM embedding_staging s "
+            "                WHERE s.case_id = c.id AND s.embedding_version = ?) "
+            "ORDER BY c.id LIMIT ?",
+            (self.target, self.target, limit),
+        ).fetchall()
+
+    def _stage(self, rows: list, embeddings: list):
+        conn = get_connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embedding_staging (case_id, embedding_version, embedding, embedding_dim) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (row["id"], self.target,
+                 encode_embedding(emb) if emb is not None else None,
+                 len(emb) if emb is not None else None)
+                for row, emb in zip(rows, embeddings)
+            ],
+        )
+        embedding_cache.put_many(
+            [(row["image_hash"], emb) for row, emb in zip(rows, embeddings)], self.target, conn=conn
+        )
+        conn.commit()
+        conn.close()
+        self.staged += len(rows)
+
+    def _cutover(self) -> bool:
+        """
+        Publish the staged version. The new index is built (and, for IVF,
+        trained) from the staging table first, without any lock: WAL readers
+        don't block writers. The write transaction then only re-checks that
+        nothing is pending, catches the index up with rows that changed
+        since the build, and copies the staged embeddings into `cases`.
+        Holding the write lock blocks store_case_embedding(), so no
+        old-version embedding can land between the check and the index swap.
+        """
+        from app.services.face_recognition_service import version_settings
+        from app.services.track_cache import track_cache
+
+        started = time.time()
+        conn = get_connection()
+        pending = self._pending(conn, limit=1)
+        conn.close()
+        if pending:
+            return False
+        new_index = create_index()
+        new_index.load_from_db(staging_version=self.target)
+        built = time.time()
+
+        conn, swapped = get_connection(), False
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if self._pending(conn, limit=1):
+                conn.rollback()
+                return False   # a report arrived during the build; stage it and rebuild
+            changed = new_index.sync_from_db(self.target, conn)
+            conn.execute(
+                "UPDATE cases SET (embedding, embedding_dim, embedding_model, embedding_version) = "
+                "(SELECT COALESCE(s.embedding, ''), s.embedding_dim, ?, "
+                "        CASE WHEN s.embedding IS NULL THEN NULL ELSE s.embedding_version END "
+                " FROM embedding_staging s WHERE s.case_id = cases.id) "
+                "WHERE id IN (SELECT case_id FROM embedding_staging WHERE embedding_version = ?)",
+                (version_settings(self.target)["model_name"], self.target),
+            )
+            conn.execute("DELETE FROM embedding_staging")
+            embedding_index.adopt(new_index)
+            swapped = True
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            if swapped:
+                embedding_index.load_from_db()   # back to what the DB still holds
+            raise
+        finally:
+            conn.close()
+
+        track_cache.clear()   # cached track matches came from the old index
+        self.remaining = 0
+        print(f"[EmbeddingRollover] Cut over to {self.target}: {len(embedding_index)} case(s), "
+              f"built in {built - started:.1f}s, write lock held {time.time() - built:.2f}s "
+              f"({changed} row(s) caught up)")
+        return True
+
+
+embedding_rollover = EmbeddingRollover(workers=config.ROLLOVER_WORKERS)
@@ -0,0 +1,58 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from app.config import config
+
+
+class Stage:
+    """
+    A named thread pool plus an asyncio concurrency limit for one kind of
+    blocking work, so async routes never run it on the event loop.
+
+    Callers over the limit wait on the semaphore (cheap, non-blocking)
+    instead of piling work into the pool, which keeps e.g. a burst of scans
+    from starving dashboard DB queries or chat traffic.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_concurrency: int = None):
+        self.name       = name
+        self._executor  = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=name)
+        self._semaphore = asyncio.Semaphore(max_concurrency or max(1, max_workers))
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn` on this stage's pool and await the result."""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    def submit(self, fn, *args, **kwargs):
+        """Fire-and-forget from sync or async code; errors are logged, not raised."""
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    def _log_failure(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"[{self.name}] Background task failed: {future.exception()}")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ── Stages ────────────────────────────────────────────────────────────────────
+# decode:    JPEG/base64 → ndarray (short, CPU-bound, releases the GIL)
+# inference: detection + ArcFace + index search; TensorFlow releases the GIL, so
+#            a few threads over the one in-process model saturate the cores
+#            without loading a model copy per worker
+# io:        blocking sqlite / file work from async routes
+# notify:    alert outbox enqueues (sqlite writes; delivery is the dispatcher's job)
+decode_stage    = Stage("decode",    max_workers=4)
+inference_stage = Stage("inference", max_workers=config.INFERENCE_THREADS)
+io_stage        = Stage("io",        max_workers=8)
+notify_stage    = Stage("notify",    max_workers=4)
+
+
+def shutdown_stages():
+    for stage in (decode_stage, inference_stage, io_stage, notify_stage):
+        stage.shutdown()
@@ -1,9 +1,13 @@
 import os
-import json
+import time
+import threading
 import cv2
 import numpy as np
 import sys
 
+from app.config import config
+from app.services.metrics import DETECTOR_CASCADE_TOTAL
+
 # Windows isolation fix: If twilio is missing from system path, check User Roaming site-packages
 try:
     import twilio
@@ -30,9 +34,256 @@ def get_deepface():
 # ── Configuration ─────────────────────────────────────────────────────────────
 # opencv: ~2-5 sec (fast, good for live scan) | ssd: ~5-10 sec | retinaface: ~15-30 sec (most accurate)
 MODEL_NAME = "ArcFace"
-DETECTOR_BACKEND = os.getenv("DEEPFACE_DETECTOR", "opencv")
 DISTANCE_METRIC = "cosine"
 MATCH_THRESHOLD = 0.55   # Cosine distance; 0.55 is a good balance for ArcFace
+EMBED_BATCH_SIZE = 32    # face crops per ArcFace forward pass
+ALIGN = True
+
+# ── Detector cascade ──────────────────────────────────────────────────────────
+# DETECTOR_CASCADE (config) lists detectors cheapest first, e.g. "opencv,retinaface"
+# or with per-stage minimum confidence "opencv:6,ssd:0.8,retinaface". The first
+# stage runs on a downscaled frame; a face it is unsure about is re-checked by
+# the next stage on just that face's region. The last stage accepts any face.
+# Scales differ per detector (opencv reports Haar level weights, the others 0-1).
+DEFAULT_MIN_CONFIDENCE = {"opencv": 5.0, "ssd": 0.8, "mtcnn": 0.9, "retinaface": 0.9, "mediapipe": 0.8}
+FIRST_PASS_MAX_SIDE    = 640   # px; longest side of the frame the first stage sees
+ROI_MARGIN             = 0.5   # face-box widths of context around a region being re-checked
+
+
+def parse_cascade(spec: str) -> list:
+    """"opencv:6,retinaface" -> [("opencv", 6.0), ("retinaface", 0.9)]"""
+    stages = []
+    for item in spec.split(","):
+        name, _, min_conf = item.strip().partition(":")
+        if name:
+            stages.append((name, float(min_conf) if min_conf else DEFAULT_MIN_CONFIDENCE.get(name, 0.0)))
+    return stages or [("opencv", DEFAULT_MIN_CONFIDENCE["opencv"])]
+
+
+CASCADE          = parse_cascade(config.DETECTOR_CASCADE)
+_MIN_CONFIDENCE  = dict(CASCADE)
+# One string naming the cascade ("opencv+retinaface"); part of the embedding version
+DETECTOR_BACKEND = "+".join(name for name, _ in CASCADE)
+
+
+def embedding_version(detector_backend: str = DETECTOR_BACKEND, model_name: str = MODEL_NAME,
+                      align: bool = ALIGN) -> str:
+    """Tag identifying the settings that produce an embedding; stored per case."""
+    return f"{model_name}/{detector_backend}/align={int(align)}"
+
+
+def version_settings(version: str = None) -> dict:
+    """
+    Keyword arguments for detect_faces()/get_embeddings_batch() that reproduce
+    the pipeline behind an embedding_version tag (the current one if None).
+    """
+    if not version:
+        return {"model_name": MODEL_NAME, "detector_backend": DETECTOR_BACKEND, "align": ALIGN}
+    model_name, detector_backend, align = version.split("/")
+    return {"model_name": model_name, "detector_backend": detector_backend, "align": align == "align=1"}
+
+
+# Embeddings with any other version were made by a different pipeline and need re-embedding
+EMBEDDING_VERSION = embedding_version()
+
+
+def _to_rgb(image):
+    """Accept a file path or an OpenCV BGR array; return an RGB array."""
+    if isinstance(image, str):
+        img = cv2.imread(image)
+        if img is None:
+            raise ValueError(f"Could not read image at {image}")
+    else:
+        img = image
+    # CRITICAL: DeepFace needs RGB for consistent embeddings
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def detect_faces(image, detector_backend: str = DETECTOR_BACKEND, enforce_detection: bool = True,
+                 model_name: str = MODEL_NAME, align: bool = ALIGN) -> list:
+    """
+    Detect and align every face in one image (path or BGR array).
+    `detector_backend` is one detector or a cascade ("opencv+retinaface").
+    Returns [{"face": aligned 112x112 RGB crop, "facial_area": {x,y,w,h}, "confidence"}].
+    """
+    img    = _to_rgb(image)
+    stages = [(name, _MIN_CONFIDENCE.get(name, DEFAULT_MIN_CONFIDENCE.get(name, 0.0)))
+              for name in detector_backend.split("+")]
+    if len(stages) == 1:
+        return _extract(img, stages[0][0], enforce_detection, model_name, align)
+
+    faces = _detect_cascade(img, stages, model_name, align)
+    if faces or enforce_detection:
+        if not faces:
+            raise ValueError("Face could not be detected by any stage of the detector cascade")
+        return faces
+    # Same fallback as a single detector with enforce_detection=False: the whole image
+    return _extract(img, stages[-1][0], False, model_name, align)
+
+
+def _extract(img_rgb, detector_backend: str, enforce_detection: bool, model_name: str, align: bool) -> list:
+    from deepface.commons import functions
+
+    face_objs = functions.extract_faces(
+        img=img_rgb,
+        target_size=functions.find_target_size(model_name=model_name),
+        detector_backend=detector_backend,
+        grayscale=False,
+        enforce_detection=enforce_detection,
+        align=align,
+    )
+    return [
+        {
+            "face":        face_obj[0][0],   # drop the leading batch axis
+            "facial_area": face_obj[1],
+            "confidence":  face_obj[2] if len(face_obj) > 2 else None,
+        }
+        for face_obj in face_objs
+    ]
+
+
+def _detect_cascade(img, stages: list, model_name: str, align: bool) -> list:
+    """
+    Run stages in order until one finds faces. Stage 0 sees a downscaled copy;
+    each face below a stage's minimum confidence is escalated to the later
+    stages on its own region of the full-resolution frame.
+    """
+    from deepface.commons import functions
+    target = max(functions.find_target_size(model_name=model_name))
+
+    for stage_no, (detector, min_conf) in enumerate(stages):
+        frame, scale = _downscale(img, FIRST_PASS_MAX_SIDE) if stage_no == 0 else (img, 1.0)
+        try:
+            found = _extract(frame, detector, True, model_name, align)
+        except ValueError:
+            found = []
+        if not found:
+            DETECTOR_CASCADE_TOTAL.inc(stage=stage_no, detector=detector, outcome="no_face")
+            continue
+
+        last, faces = stage_no == len(stages) - 1, []
+        for face in found:
+            confidence = face["confidence"]
+            if last or confidence is None or confidence >= min_conf:
+                DETECTOR_CASCADE_TOTAL.inc(stage=stage_no, detector=detector, outcome="accepted")
+                if scale != 1.0:
+                    small_side = min(face["facial_area"]["w"], face["facial_area"]["h"])
+                    face = {**face, "facial_area": _rescale(face["facial_area"], scale)}
+                    if small_side < target:
+                        # Too few pixels in the downscaled crop: re-crop from full resolution
+                        face = _detect_in_region(img, face["facial_area"], detector, model_name, align) or face
+                faces.append(face)
+                continue
+
+            DETECTOR_CASCADE_TOTAL.inc(stage=stage_no, detector=detector, outcome="escalated")
+            box = _rescale(face["facial_area"], scale)
+            for later_no, (later, later_min) in enumerate(stages[stage_no + 1:], start=stage_no + 1):
+                confirmed = _detect_in_region(img, box, later, model_name, align)
+                if confirmed is None:
+                    DETECTOR_CASCADE_TOTAL.inc(stage=later_no, detector=later, outcome="rejected")
+                    break   # the more accurate detector sees no face here: a false positive
+                conf = confirmed["confidence"]
+                if later_no == len(stages) - 1 or conf is None or conf >= later_min:
+                    DETECTOR_CASCADE_TOTAL.inc(stage=later_no, detector=later, outcome="accepted")
+                    faces.append(confirmed)
+                    break
+                DETECTOR_CASCADE_TOTAL.inc(stage=later_no, detector=later, outcome="escalated")
+        return faces
+    return []
+
+
+def _downscale(img, max_side: int) -> tuple:
+    """(frame no longer than max_side, scale factor applied)."""
+    h, w = img.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1.0:
+        return img, 1.0
+    return cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA), scale
+
+
+def _rescale(area: dict, scale: float) -> dict:
+    if scale == 1.0:
+        return area
+    return {**area, **{k: int(round(area[k] / scale)) for k in ("x", "y", "w", "h")}}
+
+
+def _detect_in_region(img, area: dict, detector: str, model_name: str, align: bool):
+    """Best face `detector` finds in `area` (plus margin) of the full frame, in frame coordinates."""
+    h, w   = img.shape[:2]
+    pad_x  = int(area["w"] * ROI_MARGIN)
+    pad_y  = int(area["h"] * ROI_MARGIN)
+    x0, y0 = max(0, area["x"] - pad_x), max(0, area["y"] - pad_y)
+    x1, y1 = min(w, area["x"] + area["w"] + pad_x), min(h, area["y"] + area["h"] + pad_y)
+    try:
+        found = _extract(img[y0:y1, x0:x1], detector, True, model_name, align)
+    except ValueError:
+        return None
+    if not found:
+        return None
+    best = max(found, key=lambda f: (f["confidence"] or 0, f["facial_area"]["w"] * f["facial_area"]["h"]))
+    best["facial_area"] = {**best["facial_area"], "x": best["facial_area"]["x"] + x0,
+                           "y": best["facial_area"]["y"] + y0}
+    return best
+
+
+def cascade_stats() -> list:
+    """Per-stage outcome counts and hit rate (faces settled without escalating) for tuning."""
+    stats = []
+    for stage_no, (detector, min_conf) in enumerate(CASCADE):
+        counts = {
+            outcome: DETECTOR_CASCADE_TOTAL.value(stage=stage_no, detector=detector, outcome=outcome)
+            for outcome in ("accepted", "escalated", "rejected", "no_face")
+        }
+        decided = counts["accepted"] + counts["escalated"]
+        stats.append({
+            "stage": stage_no, "detector": detector, "min_confidence": min_conf, **counts,
+            "hit_rate": round(counts["accepted"] / decided, 3) if decided else None,
+        })
+    return stats
+
+
+def embed_faces(faces: list, model_name: str = MODEL_NAME) -> np.ndarray:
+    """Run ArcFace on aligned crops from detect_faces() in batched forward passes."""
+    if not faces:
+        return np.empty((0, 0), dtype=np.float32)
+    model = get_deepface().build_model(model_name)
+    batch = np.stack([f["face"] for f in faces]).astype(np.float32)
+    return model.predict(batch, batch_size=EMBED_BATCH_SIZE, verbose=0)
+
+
+def get_embeddings_batch(images: list, detector_backend: str = DETECTOR_BACKEND,
+                         enforce_detection: bool = True, model_name: str = MODEL_NAME,
+                         align: bool = ALIGN) -> list:
+    """
+    Embed every face in a list of images (paths or BGR frames) with a single
+    batched ArcFace pass. Detection/alignment still runs per image.
+
+    Returns one list per input image of {"embedding", "facial_area", "confidence"};
+    an image with no detectable face (or unreadable) yields an empty list.
+    """
+    per_image = []
+    for image in images:
+        try:
+            per_image.append(detect_faces(image, detector_backend, enforce_detection, model_name, align))
+        except ValueError as e:
+            print(f"[FaceRecognition] Skipping image in batch: {e}")
+            per_image.append([])
+
+    all_faces  = [face for faces in per_image for face in faces]
+    embeddings = embed_faces(all_faces, model_name)
+
+    results, i = [], 0
+    for faces in per_image:
+        image_results = []
+        for face in faces:
+            image_results.append({
+                "embedding":   embeddings[i].tolist(),
+                "facial_area": face["facial_area"],
+                "confidence":  face["confidence"],
+            })
+            i += 1
+        results.append(image_results)
+    return results
 
 
 def get_embedding(image_path: str) -> list:
@@ -40,24 +291,9 @@ def get_embedding(image_path: str) -> list:
     Extract a face embedding from an image file.
     Ensures RGB conversion for consistency.
     """
-    DeepFace = get_deepface()
-    
-    # Load image and convert to RGB (DeepFace needs RGB for consistent embeddings)
-    img = cv2.imread(image_path)
-    if img is None:
-        raise ValueError(f"Could not read image at {image_path}")
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-    result = DeepFace.represent(
-        img_path=img_rgb,
-        model_name=MODEL_NAME,
-        detector_backend=DETECTOR_BACKEND,
-        align=True,
-        enforce_detection=True,
-    )
-    # Pick the largest face if multiple are found (DeepFace returns them sorted by size usually, but let's be safe)
-    best_face = result[0]
-    return best_face["embedding"]
+    faces = detect_faces(image_path)
+    # Pick the first face (DeepFace returns them sorted by size usually)
+    return embed_faces(faces[:1])[0].tolist()
 
 
 def embedding_from_frame(frame_bgr) -> list:
@@ -65,19 +301,56 @@ def embedding_from_frame(frame_bgr) -> list:
     Extract a face embedding directly from an OpenCV BGR numpy array.
     Ensures RGB conversion before passing to DeepFace.
     """
-    DeepFace = get_deepface()
-    
-    # CRITICAL: Convert BGR to RGB
-    frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-    
-    result = DeepFace.represent(
-        img_path=frame_rgb,
-        model_name=MODEL_NAME,
-        detector_backend=DETECTOR_BACKEND,
-        align=True,
-        enforce_detection=True,
-    )
-    return result[0]["embedding"]
+    faces = detect_faces(frame_bgr)
+    return embed_faces(faces[:1])[0].tolist()
+
+
+def embeddings_from_frame(frame_bgr) -> list:
+    """
+    Embed EVERY face in an OpenCV BGR frame in one batched pass.
+    Returns [{"embedding", "facial_area", "confidence"}]; empty if no face is found.
+    """
+    return get_embeddings_batch([frame_bgr])[0]
+
+
+# ── Warm-up / readiness ───────────────────────────────────────────────────────
+_models_ready  = threading.Event()
+_warmup_error  = None
+
+
+def warm_up():
+    """
+    Import TensorFlow, build ArcFace and the configured detector, then run one
+    dummy inference so the first real scan doesn't pay for graph construction.
+    """
+    global _warmup_error
+    started = time.time()
+    try:
+        get_deepface().build_model(MODEL_NAME)
+        # A blank frame with enforce_detection=False still goes through the
+        # detector and yields one (whole-image) crop to push through ArcFace
+        dummy = np.zeros((480, 640, 3), dtype=np.uint8)
+        embed_faces(detect_faces(dummy, enforce_detection=False))
+        _warmup_error = None
+        _models_ready.set()
+        print(f"[FaceRecognition] Models warm ({MODEL_NAME} + {DETECTOR_BACKEND}) in {time.time() - started:.1f}s")
+    except Exception as e:
+        _warmup_error = str(e)
+        print(f"[FaceRecognition] Warm-up failed: {e}")
+
+
+def start_warm_up() -> threading.Thread:
+    thread = threading.Thread(target=warm_up, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def models_ready() -> bool:
+    return _models_ready.is_set()
+
+
+def warmup_error():
+    return _warmup_error
 
 
 def cosine_distance(emb1: list, emb2: list) -> float:
@@ -94,24 +367,3 @@ def cosine_distance(emb1: list, emb2: list) -> float:
 
     return float(1.0 - np.dot(a, b))
 
-
-def match_against_cases(probe_embedding: list, cases: list) -> list:
-    """
-    Compare a probe embedding against all cases using consolidated logic.
-    """
-    results = []
-    for case in cases:
-        try:
-            stored_emb = json.loads(case["embedding"])
-        except (json.JSONDecodeError, TypeError):
-            continue
-
-        dist = cosine_distance(probe_embedding, stored_emb)
-        results.append({
-            "case": case,
-            "distance": round(dist, 4),
-            "matched": dist <= MATCH_THRESHOLD,
-        })
-
-    results.sort(key=lambda x: x["distance"])
-    return results
@@ -1,3 +1,10 @@
+import re
+import json
+import time
+import asyncio
+import importlib.util
+from collections import OrderedDict
+
 import httpx
 from app.config import config
 
@@ -12,12 +19,81 @@ Be extremely empathetic, calm, and professional. Prioritize urgent safety advice
 Keep responses brief (2-3 sentences) to avoid overwhelming the user, unless they ask for specific procedural details."""
 
 GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
+GEMINI_STREAM_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:streamGenerateContent"
+MOCK_STREAM_DELAY = 0.02   # seconds between words when replaying a canned answer as a stream
 MOCK_MODE = False  # Set to True once you have a working API key with quota
 
+# HTTP/2 multiplexes concurrent chats over one connection; needs the optional `h2` package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class ResponseCache:
+    """Bounded LRU of normalised question → answer with a per-entry TTL."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl      = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, answer)
+
+    @staticmethod
+    def normalise(message: str) -> str:
+        """'What should I do?!' and 'what should i do' share one entry."""
+        return " ".join(re.sub(r"[^\w\s]", " ", message.lower()).split())
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, answer: str):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
 
 class GeminiChatService:
+    """
+    Chat backend with one long-lived, pooled httpx.AsyncClient (opened and
+    closed with the app), an answer cache for the handful of questions most
+    users ask, and a cap on concurrent Gemini calls so a traffic spike queues
+    briefly and then degrades to the canned answers instead of burning quota.
+    """
+
     def __init__(self):
-        self.api_key = config.GEMINI_API_KEY
+        self.api_key    = config.GEMINI_API_KEY
+        self.cache      = ResponseCache(config.CHAT_CACHE_SIZE, config.CHAT_CACHE_TTL)
+        self._client    = None
+        self._semaphore = asyncio.Semaphore(config.GEMINI_MAX_CONCURRENCY)
+        self._inflight  = {}   # normalised question -> Task, so identical concurrent asks share one call
+
+    # ── Client lifecycle (owned by the app's startup / shutdown hooks) ───────
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=config.GEMINI_MAX_CONCURRENCY * 2,
+                                    max_keepalive_connections=config.GEMINI_MAX_CONCURRENCY,
+                                    keepalive_expiry=120.0),
+            )
+            print(f"[Gemini] HTTP client ready (http2={'on' if HTTP2_AVAILABLE else 'off'})")
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     def get_mock_response(self, user_message: str) -> str:
         msg = user_message.lower()
@@ -35,45 +111,148 @@ class GeminiChatService:
         # Default fallback for mock mode
         return "I'm here to help. You can report a missing person by clicking the 'Report Case' button on the dashboard."
 
+    def _payload(self, user_message: str) -> dict:
+        # Prepend instructions to ensure context is maintained
+        full_prompt = f"{SYSTEM_PROMPT}\n\nUser: {user_message}"
+
+        return {
+            "contents": [
+                {
+                    "role": "user",
+                    "parts": [{"text": full_prompt}]
+                }
+            ],
+            "generationConfig": {
+                "temperature": 0.7,
+                "maxOutputTokens": 400,
+            }
+        }
+
     async def get_response(self, user_message: str) -> str:
         if MOCK_MODE:
             return self.get_mock_response(user_message)
 
+        key    = self.cache.normalise(user_message)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Identical questions in flight share one upstream call. It runs as its
+        # own task, so a caller disconnecting doesn't cancel it for the others.
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(user_message, key))   # never raises except on cancellation
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _fetch(self, user_message: str, key: str) -> str:
         try:
-            # Prepend instructions to ensure context is maintained
-            full_prompt = f"{SYSTEM_PROMPT}\n\nUser: {user_message}"
-            
-            payload = {
-                "contents": [
-                    {
-                        "role": "user",
-                        "parts": [{"text": full_prompt}]
-                    }
-                ],
-                "generationConfig": {
-                    "temperature": 0.7,
-                    "maxOutputTokens": 400,
-                }
-            }
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=config.GEMINI_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("[Gemini] Too many concurrent chats; serving canned answer")
+            return self.get_mock_response(user_message)
+
+        try:
+            client = self._client or await self.start()
+            response = await client.post(
+                f"{GEMINI_API_URL}?key={self.api_key}",
+                json=self._payload(user_message),
+            )
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{GEMINI_API_URL}?key={self.api_key}",
-                    json=payload,
-                )
-                
-                if response.status_code == 429:
-                    # Graceful Fallback: If 429 (Quota), return a high-quality mock response
-                    return self.get_mock_response(user_message)
-                
-                if response.status_code != 200:
-                    return self.get_mock_response(user_message)
-                
-                data = response.json()
-                return data["candidates"][0]["content"]["parts"][0]["text"]
+            if response.status_code == 429:
+                # Graceful Fallback: If 429 (Quota), return a high-quality mock response
+                return self.get_mock_response(user_message)
+
+            if response.status_code != 200:
+                return self.get_mock_response(user_message)
+
+            data  = response.json()
+            reply = data["candidates"][0]["content"]["parts"][0]["text"]
+            self.cache.put(key, reply)   # only real answers; fallbacks are retried next time
+            return reply
         except Exception as e:
             print(f"Gemini API error: {e}")
             return self.get_mock_response(user_message)
+        finally:
+            self._semaphore.release()
+
+    # ── Streaming (server-sent events from streamGenerateContent) ─────────────
+    async def _mock_stream(self, user_message: str):
+        words = self.get_mock_response(user_message).split(" ")
+        for i, word in enumerate(words):
+            yield word if i == 0 else " " + word
+            await asyncio.sleep(MOCK_STREAM_DELAY)
+
+    async def stream_response(self, user_message: str, info: dict = None):
+        """
+        Yield the reply in text chunks as Gemini generates them. Falls back to
+        streaming the canned answer if the API is unavailable before the first
+        chunk arrives. `info["source"]` is set to "gemini", "cache" or "mock".
+        """
+        info = info if info is not None else {}
+        info["source"] = "mock"
+        if MOCK_MODE:
+            async for chunk in self._mock_stream(user_message):
+                yield chunk
+            return
+
+        key    = self.cache.normalise(user_message)
+        cached = self.cache.get(key)
+        if cached is not None:
+            info["source"] = "cache"
+            yield cached
+            return
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=config.GEMINI_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("[Gemini] Too many concurrent chats; serving canned answer")
+            async for chunk in self._mock_stream(user_message):
+                yield chunk
+            return
+
+        parts, finish_reason = [], None
+        try:
+            client = self._client or await self.start()
+            async with client.stream(
+                "POST",
+                f"{GEMINI_STREAM_URL}?alt=sse&key={self.api_key}",
+                json=self._payload(user_message),
+            ) as response:
+                if response.status_code == 200:
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        event     = json.loads(line[5:])
+                        candidate = event.get("candidates", [{}])[0]
+                        finish_reason = candidate.get("finishReason") or finish_reason
+                        for part in candidate.get("content", {}).get("parts", []):
+                            if part.get("text"):
+                                info["source"] = "gemini"
+                                parts.append(part["text"])
+                                yield part["text"]
+                else:
+                    print(f"[Gemini] Stream request failed with HTTP {response.status_code}")
+        except Exception as e:
+            print(f"Gemini API error: {e}")
+        finally:
+            self._semaphore.release()
+
+        if parts:
+            # Cache only replies Gemini finished; a stream cut short mid-reply
+            # is not served to later askers (and gets no canned answer appended)
+            if finish_reason == "STOP":
+                self.cache.put(key, "".join(parts))
+            else:
+                print(f"[Gemini] Stream ended early (finishReason={finish_reason}); reply not cached")
+        else:
+            async for chunk in self._mock_stream(user_message):
+                yield chunk
 
 
 chat_service = GeminiChatService()
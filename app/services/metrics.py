@@ -0,0 +1,223 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Seconds; covers a ~1 ms index search up to a 30 s cold DeepFace call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Registry:
+    """Every metric created in the process, rendered in Prometheus text format by /metrics."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock    = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def _label_str(labelnames: tuple, key: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, key)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name       = name
+        self.help       = help
+        self.labelnames = tuple(labelnames)
+        self._lock      = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (scans, matches, failures...)."""
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        super().__init__(name, help, labelnames)
+        self._values = {} if labelnames else {(): 0.0}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, key)} {_fmt(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """
+    Point-in-time value. Either set() it, or pass `fn` to read it at scrape
+    time (queue depth, index size) so nothing has to keep it up to date.
+    """
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), fn=None):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+        self._fn     = fn
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def samples(self) -> list:
+        if self._fn is not None:
+            try:
+                return [f"{self.name} {_fmt(self._fn())}"]
+            except Exception as e:
+                print(f"[Metrics] Could not read {self.name}: {e}")
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, key)} {_fmt(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Distribution of durations (seconds) in cumulative buckets, plus _sum and _count."""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}   # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a `with` block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _label_str(self.labelnames, key, f'le="{_fmt(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _label_str(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_fmt(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+# ── Scan path ─────────────────────────────────────────────────────────────────
+SCAN_STAGE_SECONDS = Histogram(
+    "scan_stage_seconds", "Live-scan time per stage (decode, detect, embed, search)", ("stage",)
+)
+SCAN_SECONDS       = Histogram("scan_seconds", "Detect + embed + match time for one frame")
+SCANS_TOTAL        = Counter("scans_total", "Frames scanned")
+SCAN_NO_FACE_TOTAL = Counter("scan_no_face_total", "Scanned frames in which no face was detected")
+SCAN_ERRORS_TOTAL  = Counter("scan_errors_total", "Scans that failed with an error")
+SCAN_MATCHES_TOTAL = Counter("scan_matches_total", "Candidate case matches returned by scans (distance < 0.6)")
+SCAN_FRAME_BYTES   = Histogram(
+    "scan_frame_bytes", "Size of uploaded scan frames by transport (json, multipart, binary, ws)", ("transport",),
+    buckets=(8e3, 16e3, 32e3, 64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 4e6),
+)
+
+DETECTOR_CASCADE_TOTAL = Counter(
+    "detector_cascade_total",
+    "Detector cascade outcomes per stage: accepted, escalated (low confidence), rejected, no_face",
+    ("stage", "detector", "outcome"),
+)
+
+CAMERA_FRAMES_TOTAL = Counter(
+    "camera_frames_total",
+    "Ingested camera frames: sampled (decoded), superseded (replaced before a scan slot), scanned",
+    ("camera", "outcome"),
+)
+
+# ── Alerts ────────────────────────────────────────────────────────────────────
+ALERT_SEND_SECONDS   = Histogram("alert_send_seconds", "Time to hand one WhatsApp alert to Twilio")
+ALERTS_SENT_TOTAL    = Counter("alerts_sent_total", "WhatsApp alerts delivered", ("kind",))
+ALERT_FAILURES_TOTAL = Counter(
+    "alert_failures_total", "Failed WhatsApp send attempts (final = given up, no more retries)", ("kind", "final")
+)
+
+# ── Embeddings ────────────────────────────────────────────────────────────────
+EMBEDDING_JOBS_TOTAL = Counter("embedding_jobs_total", "Report photos embedded by the worker pool", ("result",))
+
+
+def _embedding_queue_depth():
+    from app.services.embedding_queue import embedding_queue
+    return embedding_queue.depth()
+
+
+def _alert_outbox_depth():
+    from app.services.alert_dispatcher import alert_dispatcher
+    return alert_dispatcher.depth()
+
+
+def _index_size():
+    from app.services.embedding_index import embedding_index
+    return len(embedding_index)
+
+
+EMBEDDING_QUEUE_DEPTH = Gauge("embedding_queue_depth", "Embedding jobs pending or running", fn=_embedding_queue_depth)
+ALERT_OUTBOX_DEPTH    = Gauge("alert_outbox_depth", "WhatsApp alerts waiting to be sent", fn=_alert_outbox_depth)
+INDEX_SIZE            = Gauge("embedding_index_size", "Case embeddings in the in-memory index", fn=_index_size)
+
+# ── Chat ──────────────────────────────────────────────────────────────────────
+CHAT_TTFT_SECONDS = Histogram("chat_ttft_seconds", "Time to first streamed chatbot token", ("source",))
@@ -0,0 +1,104 @@
+import time
+import threading
+
+TRACK_IOU_THRESHOLD = 0.6   # box overlap needed to treat a face as the same person
+TRACK_TTL           = 2.0   # seconds unseen before a track is dropped
+TRACK_MAX_AGE       = 5.0   # seconds before a track's embedding is considered stale
+
+
+class Track:
+    __slots__ = ("box", "embedding", "matches", "embedded_at", "last_seen")
+
+    def __init__(self, box: dict, embedding, matches: list, now: float):
+        self.box         = box
+        self.embedding   = embedding
+        self.matches     = matches
+        self.embedded_at = now
+        self.last_seen   = now
+
+
+def iou(a: dict, b: dict) -> float:
+    """Intersection-over-union of two {x, y, w, h} boxes."""
+    a = {k: float(a[k]) for k in ("x", "y", "w", "h")}
+    b = {k: float(b[k]) for k in ("x", "y", "w", "h")}
+    ix = max(0, min(a["x"] + a["w"], b["x"] + b["w"]) - max(a["x"], b["x"]))
+    iy = max(0, min(a["y"] + a["h"], b["y"] + b["h"]) - max(a["y"], b["y"]))
+    inter = ix * iy
+    union = a["w"] * a["h"] + b["w"] * b["h"] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class TrackCache:
+    """
+    Short-lived per-camera face tracks. A static camera sends near-identical
+    frames several times a second; when a detected face box overlaps a recent
+    track heavily, the track's embedding and matches are reused and ArcFace
+    only runs for new or stale tracks.
+    """
+
+    def __init__(self, iou_threshold: float = TRACK_IOU_THRESHOLD,
+                 ttl: float = TRACK_TTL, max_age: float = TRACK_MAX_AGE):
+        self.iou_threshold = iou_threshold
+        self.ttl           = ttl
+        self.max_age       = max_age
+        self._cameras      = {}   # camera_id -> [Track]; cameras without live tracks are dropped
+        self._swept_at     = 0.0
+        self._lock         = threading.Lock()
+
+    def assign(self, camera_id: str, boxes: list, now: float = None) -> list:
+        """
+        Match detected boxes to fresh tracks (greedy, one-to-one by IoU).
+        Returns a Track per box to reuse, or None where inference is needed.
+        """
+        now = now or time.time()
+        with self._lock:
+            if now - self._swept_at > self.ttl:
+                self._sweep(now)
+            tracks = [t for t in self._cameras.get(camera_id, []) if self._live(t, now)]
+            if tracks:
+                self._cameras[camera_id] = tracks
+            else:
+                self._cameras.pop(camera_id, None)
+
+            pairs = sorted(
+                ((iou(box, t.box), i, j) for i, box in enumerate(boxes) for j, t in enumerate(tracks)),
+                reverse=True,
+            )
+            assigned, used = [None] * len(boxes), set()
+            for overlap, i, j in pairs:
+                if overlap < self.iou_threshold:
+                    break
+                if assigned[i] is not None or j in used:
+                    continue
+                track = tracks[j]
+                track.box, track.last_seen = boxes[i], now
+                assigned[i] = track
+                used.add(j)
+            return assigned
+
+    def store(self, camera_id: str, box: dict, embedding, matches: list, now: float = None) -> Track:
+        """Start a track for a freshly embedded face."""
+        track = Track(box, embedding, matches, now or time.time())
+        with self._lock:
+            self._cameras.setdefault(camera_id, []).append(track)
+        return track
+
+    def _live(self, track: Track, now: float) -> bool:
+        return now - track.last_seen <= self.ttl and now - track.embedded_at <= self.max_age
+
+    def _sweep(self, now: float):
+        """Forget cameras whose tracks have all expired (e.g. a camera that stopped sending)."""
+        for camera_id in [cid for cid, tracks in self._cameras.items()
+                          if not any(self._live(t, now) for t in tracks)]:
+            del self._cameras[camera_id]
+        self._swept_at = now
+
+    def clear(self, camera_id: str = None):
+        with self._lock:
+            if camera_id is None:
+                self._cameras.clear()
+            else:
+                self._cameras.pop(camera_id, None)
+
+
+track_cache = TrackCache()
@@ -16,6 +16,56 @@ FROM_WHATSAPP  = os.getenv("TWILIO_FROM_WHATSAPP", "whatsapp:+14155238886")  # T
 OFFICER_PHONE  = os.getenv("OFFICER_PHONE", "8589958840")   # contact number shown in message
 
 
+# Twilio REST endpoint; point at a local stand-in for offline testing
+TWILIO_API_BASE = os.getenv("TWILIO_API_BASE", "https://api.twilio.com").rstrip("/")
+
+
+# ── Pooled Twilio transport (used by the alert dispatcher's sender threads) ───
+_client = None
+
+
+def _get_client():
+    """One keep-alive httpx client for every send instead of a twilio.rest.Client per message."""
+    global _client
+    if _client is None:
+        import httpx
+        _client = httpx.Client(
+            auth=(ACCOUNT_SID or "", AUTH_TOKEN or ""),
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=8),
+        )
+    return _client
+
+
+def twilio_transport(to_number: str, body: str) -> str:
+    """
+    POST one message to Twilio's Messages API and return its SID.
+    Raises DeliveryError; 429 / 5xx / network errors are retryable, other 4xx are not.
+    """
+    import httpx
+    from app.services.alert_dispatcher import DeliveryError
+
+    url = f"{TWILIO_API_BASE}/2010-04-01/Accounts/{ACCOUNT_SID}/Messages.json"
+    try:
+        response = _get_client().post(url, data={"From": FROM_WHATSAPP, "To": to_number, "Body": body})
+    except httpx.HTTPError as e:
+        raise DeliveryError(f"network error: {e}", retryable=True)
+
+    if response.status_code == 429 or response.status_code >= 500:
+        raise DeliveryError(f"HTTP {response.status_code}: {response.text[:200]}", retryable=True)
+    if response.status_code >= 400:
+        raise DeliveryError(f"HTTP {response.status_code}: {response.text[:200]}", retryable=False)
+    return response.json().get("sid")
+
+
+def close_client():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+# ── Alerts (enqueued on the outbox; delivered by app.services.alert_dispatcher) ─
 def send_match_alert(
     complainant_phone: str,
     missing_name: str,
@@ -25,7 +75,10 @@ def send_match_alert(
     officer_no: str = "0000000000"
 ) -> dict:
     """
-    Send a WhatsApp alert to `complainant_phone` when a missing person is spotted.
+    Queue a WhatsApp alert to `complainant_phone` when a missing person is spotted.
+
+    Repeat sightings of the same case (or alerts to the same phone) inside the
+    dispatcher's dedup windows are suppressed.
 
     Args:
         complainant_phone : phone number of the complainant, e.g. '9876543210' or '+919876543210'
@@ -34,10 +87,10 @@ def send_match_alert(
         case_id           : optional case ID from the database
 
     Returns:
-        dict with 'success' bool and 'sid' or 'error' keys.
+        dict with 'success' bool and 'queued' (outbox id) or 'duplicate' keys.
     """
-    print(f"[WhatsApp] DEBUG: send_match_alert called for {missing_name} to {complainant_phone}")
-    
+    from app.services.alert_dispatcher import alert_dispatcher
+
     if not ACCOUNT_SID or not AUTH_TOKEN:
         print("[WhatsApp] ERROR: Twilio credentials missing in .env")
         raise EnvironmentError(
@@ -49,8 +102,6 @@ def send_match_alert(
 
     similarity_pct = max(0, round((1 - match_distance) * 100, 1))
 
-    case_ref = f"Case #{case_id}" if case_id else "a reported case"
-
     message_body = (
         f"🚨 *Missing Person Found*\n\n"
         f"Your dear one (*{missing_name}*) is here!\n\n"
@@ -60,23 +111,12 @@ def send_match_alert(
         f"— National Missing Person Support System"
     )
 
-    try:
-        print("[WhatsApp] DEBUG: Importing twilio...")
-        from twilio.rest import Client
-        print("[WhatsApp] DEBUG: Initializing Twilio Client...")
-        client = Client(ACCOUNT_SID, AUTH_TOKEN)
-        print(f"[WhatsApp] DEBUG: Sending message from {FROM_WHATSAPP} to {to_number}...")
-        message = client.messages.create(
-            from_=FROM_WHATSAPP,
-            to=to_number,
-            body=message_body,
-        )
-        print(f"[WhatsApp] Message sent ✔  SID: {message.sid}  →  {to_number}")
-        return {"success": True, "sid": message.sid}
-
-    except Exception as e:
-        print(f"[WhatsApp] Failed to send message: {e}")
-        return {"success": False, "error": str(e)}
+    alert_id = alert_dispatcher.enqueue("match", to_number, message_body, case_id=case_id)
+    if alert_id is None:
+        print(f"[WhatsApp] Duplicate alert for {missing_name} suppressed")
+        return {"success": True, "duplicate": True}
+    print(f"[WhatsApp] Alert for {missing_name} queued (#{alert_id}) →  {to_number}")
+    return {"success": True, "queued": alert_id}
 
 
 def send_report_confirmation(
@@ -86,7 +126,7 @@ def send_report_confirmation(
     case_id: int
 ) -> dict:
     """
-    Send a WhatsApp confirmation to the complainant when they report a missing person.
+    Queue a WhatsApp confirmation to the complainant when they report a missing person.
 
     Args:
         complainant_phone : phone number of the complainant
@@ -95,8 +135,10 @@ def send_report_confirmation(
         case_id          : the case ID assigned
 
     Returns:
-        dict with 'success' bool and 'sid' or 'error' keys.
+        dict with 'success' bool and 'queued' or 'error' keys.
     """
+    from app.services.alert_dispatcher import alert_dispatcher
+
     if not ACCOUNT_SID or not AUTH_TOKEN:
         return {"success": False, "error": "Twilio credentials not configured"}
 
@@ -111,19 +153,10 @@ def send_report_confirmation(
         f"— National Missing Person Support System"
     )
 
-    try:
-        from twilio.rest import Client
-        client = Client(ACCOUNT_SID, AUTH_TOKEN)
-        message = client.messages.create(
-            from_=FROM_WHATSAPP,
-            to=to_number,
-            body=message_body,
-        )
-        print(f"[WhatsApp] Report confirmation sent ✔  SID: {message.sid}  →  {to_number}")
-        return {"success": True, "sid": message.sid}
-    except Exception as e:
-        print(f"[WhatsApp] Failed to send report confirmation: {e}")
-        return {"success": False, "error": str(e)}
+    # One confirmation per case; a complainant filing two reports gets both
+    alert_id = alert_dispatcher.enqueue("report_confirmation", to_number, message_body,
+                                        case_id=case_id, dedup=False)
+    return {"success": True, "queued": alert_id}
 
 
 def _normalise_phone(phone: str) -> str:
@@ -0,0 +1,96 @@
+"""
+Recall / latency benchmark: IVF (approximate) vs exact case-embedding search.
+
+Runs fully offline on synthetic ArcFace-like vectors: identities are drawn
+around a set of cluster centres (faces of similar demographics sit close
+together), and every query is a noisy re-capture of one stored identity.
+Clusters overlap (--separation well below 1, the per-identity spread) as
+real embeddings do, so a query's nearest neighbours straddle several IVF
+lists and a low nprobe visibly loses recall.
+
+USAGE
+-----
+  python bench_ann_recall.py
+  python bench_ann_recall.py --cases 200000 --queries 500 --nprobe 1 4 8 16 32
+
+Reports recall@k (fraction of the exact top-k that IVF also returns) and
+mean / p99 query latency for each nprobe setting.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.services.embedding_index import EmbeddingIndex
+from app.services.ann_index import IVFIndex
+
+
+def make_dataset(n_cases: int, n_queries: int, dim: int, n_clusters: int, separation: float,
+                 noise: float, seed: int):
+    rng      = np.random.default_rng(seed)
+    centres  = separation * rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    members  = rng.integers(0, n_clusters, n_cases)
+    cases    = centres[members] + rng.standard_normal((n_cases, dim)).astype(np.float32)
+    targets  = rng.integers(0, n_cases, n_queries)
+    queries  = cases[targets] + noise * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    return cases, queries
+
+
+def run_queries(index, queries, k):
+    latencies, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        hits  = index.search(q, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([h["case_id"] for h in hits])
+    return results, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases",    type=int,   default=50000)
+    parser.add_argument("--queries",  type=int,   default=300)
+    parser.add_argument("--dim",      type=int,   default=512)
+    parser.add_argument("--clusters", type=int,   default=200,  help="synthetic demographic clusters")
+    parser.add_argument("--separation", type=float, default=0.4,
+                        help="cluster-centre spread relative to identity spread (1.0); higher = easier for IVF")
+    parser.add_argument("--noise",    type=float, default=0.6,  help="query noise vs stored vector")
+    parser.add_argument("--k",        type=int,   default=10)
+    parser.add_argument("--nlist",    type=int,   default=0,    help="IVF lists (0 = sqrt(N))")
+    parser.add_argument("--nprobe",   type=int,   nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--seed",     type=int,   default=0)
+    args = parser.parse_args()
+
+    print(f"Generating {args.cases} cases / {args.queries} queries (dim={args.dim}) …")
+    cases, queries = make_dataset(args.cases, args.queries, args.dim, args.clusters, args.separation,
+                                  args.noise, args.seed)
+
+    exact = EmbeddingIndex()
+    ivf   = IVFIndex(nlist=args.nlist)
+    for case_id, vec in enumerate(cases):
+        exact.upsert(case_id, vec)
+        ivf.upsert(case_id, vec)
+
+    start = time.perf_counter()
+    ivf.train()
+    print(f"IVF training: {time.perf_counter() - start:.2f}s ({len(ivf._centroids)} lists)\n")
+
+    truth, exact_ms = run_queries(exact, queries, args.k)
+    print(f"{'backend':<14}{'recall@' + str(args.k):>10}{'mean ms':>10}{'p99 ms':>10}{'speedup':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{exact_ms.mean():>10.2f}{np.percentile(exact_ms, 99):>10.2f}{1.0:>10.1f}")
+
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        found, ivf_ms = run_queries(ivf, queries, args.k)
+        recall = np.mean([len(set(t) & set(f)) / len(t) for t, f in zip(truth, found)])
+        print(
+            f"{'ivf/' + str(nprobe):<14}{recall:>10.3f}{ivf_ms.mean():>10.2f}"
+            f"{np.percentile(ivf_ms, 99):>10.2f}{exact_ms.mean() / ivf_ms.mean():>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Offline recognition benchmark: per-stage scan latency and memory vs case count.
+
+Builds a synthetic case database per size (random unit vectors with random
+region / gender / age, plus the real photos in sample_faces/ so scans have
+true matches), then measures:
+
+  model stages  (once; need DeepFace)  decode, detection, alignment, embedding,
+                                       embedding_from_frame end to end
+  per size                             DB load into the index, index memory,
+                                       matching (search_batch), and the full
+                                       scan_frame path (_match_frame)
+
+Everything is written to a JSON report; pass an older report with
+--compare to print p50 / p99 / memory changes and flag regressions.
+
+USAGE
+-----
+  python bench_scan.py                                  # 1k / 10k / 100k / 1M cases
+  python bench_scan.py --sizes 1000 10000 --frames 20 --output before.json
+  python bench_scan.py --sizes 1000 10000 --compare before.json --output after.json
+  python bench_scan.py --backend ivf --nprobe 8
+
+Without DeepFace installed the model stages and the scan_frame path are
+reported as skipped; DB load, memory and matching still run (probes are then
+noisy copies of stored vectors).
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.models import database
+from app.models.database import init_db, get_connection, encode_embedding
+from app.services.face_recognition_service import MODEL_NAME, EMBEDDING_VERSION
+
+DEFAULT_SIZES   = [1000, 10000, 100000, 1000000]
+SAMPLE_DIR      = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_faces")
+INSERT_BATCH    = 5000
+STATES          = ["Kerala", "Goa", "Delhi", "Maharashtra", "Karnataka", "Tamil Nadu", "Punjab", "Assam"]
+CITIES          = ["North", "South", "East", "West", "Central"]
+GENDERS         = ["Male", "Female", "Other"]
+REGRESSION_PCT  = 10.0   # --compare flags p50 / p99 / memory growth beyond this
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def summarise(samples_ms: list) -> dict:
+    a = np.asarray(samples_ms, dtype=np.float64)
+    if a.size == 0:
+        return {"n": 0}
+    return {
+        "n":       int(a.size),
+        "mean_ms": round(float(a.mean()), 3),
+        "p50_ms":  round(float(np.percentile(a, 50)), 3),
+        "p99_ms":  round(float(np.percentile(a, 99)), 3),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start  = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:   # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def index_bytes(index) -> int:
+    blocks = getattr(index, "_lists", None) or list(getattr(index, "_blocks", {}).values())
+    total  = sum(b.vectors.nbytes + b.ids.nbytes + b.attrs.nbytes for b in blocks)
+    centroids = getattr(index, "_centroids", None)
+    return total + (centroids.nbytes if centroids is not None else 0)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_samples():
+    """[(name, JPEG bytes)] for every photo in sample_faces/."""
+    samples = []
+    for name in sorted(os.listdir(SAMPLE_DIR)) if os.path.isdir(SAMPLE_DIR) else []:
+        with open(os.path.join(SAMPLE_DIR, name), "rb") as f:
+            data = f.read()
+        if cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) is not None:
+            samples.append((name, data))
+    return samples
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Model stages (DeepFace)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def bench_model_stages(samples: list, frames: int) -> dict:
+    from app.services.face_recognition_service import (
+        detect_faces, embed_faces, embedding_from_frame, warm_up,
+    )
+    warm_up()
+    stages = {name: [] for name in ("decode", "detection", "alignment", "embedding", "embedding_from_frame")}
+    for i in range(frames):
+        _, data = samples[i % len(samples)]
+        frame, ms = timed(cv2.imdecode, np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        stages["decode"].append(ms)
+        # Alignment runs inside the detector call: time it as aligned minus unaligned detection
+        _, raw_ms = timed(detect_faces, frame, enforce_detection=False, align=False)
+        faces, aligned_ms = timed(detect_faces, frame, enforce_detection=False)
+        stages["detection"].append(raw_ms)
+        stages["alignment"].append(max(0.0, aligned_ms - raw_ms))
+        _, ms = timed(embed_faces, faces[:1])
+        stages["embedding"].append(ms)
+        _, ms = timed(embedding_from_frame, frame)
+        stages["embedding_from_frame"].append(ms)
+    return {name: summarise(samples_ms) for name, samples_ms in stages.items()}
+
+
+def sample_embeddings(samples: list) -> list:
+    from app.services.face_recognition_service import embedding_from_frame
+    embeddings = []
+    for name, data in samples:
+        try:
+            frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            embeddings.append((name, np.asarray(embedding_from_frame(frame), dtype=np.float32)))
+        except ValueError as e:
+            print(f"  sample {name}: {e}")
+    return embeddings
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Per-size stages
+# ─────────────────────────────────────────────────────────────────────────────
+
+def build_db(path: str, n_cases: int, dim: int, real: list, seed: int):
+    """Fresh DB with `n_cases` synthetic cases; the real sample embeddings come first."""
+    database.DB_PATH = path
+    init_db()
+    rng  = np.random.default_rng(seed)
+    conn = get_connection()
+    for start in range(0, n_cases, INSERT_BATCH):
+        count   = min(INSERT_BATCH, n_cases - start)
+        vectors = rng.standard_normal((count, dim)).astype(np.float32)
+        rows    = []
+        for i in range(count):
+            case_no = start + i
+            if case_no < len(real):
+                name, vec = real[case_no]
+            else:
+                name, vec = f"Synthetic {case_no}", vectors[i]
+            rows.append((
+                name, GENDERS[case_no % 3], int(rng.integers(3, 90)),
+                STATES[case_no % len(STATES)], CITIES[case_no % len(CITIES)],
+                f"sample_{case_no}.jpg", encode_embedding(vec), dim, MODEL_NAME, EMBEDDING_VERSION,
+                "Bench Complainant", f"+9100000{case_no:05d}",
+            ))
+        conn.executemany(
+            "INSERT INTO cases (missing_full_name, gender, age, missing_state, missing_city, image_path, "
+            "embedding, embedding_dim, embedding_model, embedding_version, complainant_name, complainant_phone) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+    conn.close()
+
+
+def make_index(backend: str, nprobe: int):
+    from app.services.embedding_index import EmbeddingIndex
+    if backend == "ivf":
+        from app.services.ann_index import IVFIndex
+        return IVFIndex(nprobe=nprobe)
+    return EmbeddingIndex()
+
+
+def bench_size(n_cases: int, args, real: list, probes: np.ndarray, frames_bgr: list) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench_scan_")
+    db_path = os.path.join(workdir, "bench.db")
+    result  = {"cases": n_cases}
+    try:
+        _, ms = timed(build_db, db_path, n_cases, args.dim, real, args.seed)
+        result["db_build_ms"] = round(ms, 1)
+        result["db_file_mb"]  = round(os.path.getsize(db_path) / 1e6, 1)
+
+        index = make_index(args.backend, args.nprobe)
+        _, ms = timed(index.load_from_db)
+        result["db_load_ms"]     = round(ms, 1)
+        result["index_mb"]       = round(index_bytes(index) / 1e6, 2)
+        result["peak_rss_mb"]    = peak_rss_mb()
+
+        # Matching: one search_batch per frame, as the scan path does
+        match_ms = []
+        for i in range(args.frames):
+            batch = probes[(i * args.faces) % len(probes):][:args.faces]
+            _, ms = timed(index.search_batch, list(batch), k=20, max_distance=0.6)
+            match_ms.append(ms)
+        result["matching"] = summarise(match_ms)
+
+        if frames_bgr:
+            from app.services.embedding_index import embedding_index
+            from app.services.track_cache import track_cache
+            from app.routes.officer import _match_frame
+            embedding_index.adopt(index)
+            scan_ms = []
+            for i in range(args.frames):
+                track_cache.clear()   # measure the full detect + embed + match path, not track reuse
+                _, ms = timed(_match_frame, frames_bgr[i % len(frames_bgr)], "bench")
+                scan_ms.append(ms)
+            result["scan_frame"] = summarise(scan_ms)
+        else:
+            result["scan_frame"] = {"skipped": "DeepFace not installed"}
+    finally:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+    return result
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Report comparison
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _metrics(report: dict) -> dict:
+    """Flatten a report into {"sizes.10000.matching.p99_ms": value, ...} for comparison."""
+    flat = {}
+    for stage, stats in report.get("model_stages", {}).items():
+        for key in ("p50_ms", "p99_ms"):
+            if key in stats:
+                flat[f"model.{stage}.{key}"] = stats[key]
+    for size, stats in report.get("sizes", {}).items():
+        for key in ("db_load_ms", "index_mb", "peak_rss_mb"):
+            if stats.get(key) is not None:
+                flat[f"{size}.{key}"] = stats[key]
+        for stage in ("matching", "scan_frame"):
+            for key in ("p50_ms", "p99_ms"):
+                if key in stats.get(stage, {}):
+                    flat[f"{size}.{stage}.{key}"] = stats[stage][key]
+    return flat
+
+
+def compare(old: dict, new: dict) -> list:
+    old_m, new_m = _metrics(old), _metrics(new)
+    print(f"\nvs {old.get('meta', {}).get('commit')}:")
+    print(f"{'metric':<36}{'before':>12}{'after':>12}{'change':>10}")
+    regressions = []
+    for key in sorted(old_m.keys() & new_m.keys()):
+        before, after = old_m[key], new_m[key]
+        change = (after - before) / before * 100 if before else 0.0
+        flag   = "  ⚠" if change > REGRESSION_PCT else ""
+        if flag:
+            regressions.append(key)
+        print(f"{key:<36}{before:>12.2f}{after:>12.2f}{change:>9.1f}%{flag}")
+    return regressions
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Main
+# ─────────────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes",   type=int, nargs="+", default=DEFAULT_SIZES, help="case counts to benchmark")
+    parser.add_argument("--frames",  type=int, default=50, help="frames (iterations) per stage")
+    parser.add_argument("--faces",   type=int, default=1,  help="faces per frame for the matching stage")
+    parser.add_argument("--dim",     type=int, default=512)
+    parser.add_argument("--backend", choices=["exact", "ivf"], default="exact")
+    parser.add_argument("--nprobe",  type=int, default=8, help="IVF lists scanned per query")
+    parser.add_argument("--seed",    type=int, default=0)
+    parser.add_argument("--output",  default="bench_report.json")
+    parser.add_argument("--compare", help="earlier report to diff against")
+    args = parser.parse_args()
+
+    samples   = load_samples()
+    has_model = importlib.util.find_spec("deepface") is not None and bool(samples)
+    report    = {
+        "meta": {
+            "commit":    git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python":    platform.python_version(),
+            "numpy":     np.__version__,
+            "platform":  platform.platform(),
+            "cpus":      os.cpu_count(),
+            "args":      vars(args),
+        },
+        "model_stages": {},
+        "sizes": {},
+    }
+
+    real, frames_bgr = [], []
+    if has_model:
+        print(f"Model stages over {args.frames} frame(s) from {len(samples)} sample photo(s) …")
+        report["model_stages"] = bench_model_stages(samples, args.frames)
+        real       = sample_embeddings(samples)
+        frames_bgr = [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) for _, data in samples]
+        args.dim   = len(real[0][1]) if real else args.dim
+    else:
+        print("DeepFace (or sample_faces/) not available: skipping model stages and the scan_frame path")
+        report["model_stages"] = {"skipped": "DeepFace not installed"}
+
+    # Probes: real sample embeddings if we have them, else noisy copies of the first synthetic cases
+    rng = np.random.default_rng(args.seed)
+    if real:
+        probes = np.stack([vec for _, vec in real])
+    else:
+        stored = np.random.default_rng(args.seed).standard_normal((64, args.dim)).astype(np.float32)
+        probes = stored + 0.3 * rng.standard_normal(stored.shape).astype(np.float32)
+
+    for n_cases in args.sizes:
+        print(f"\n── {n_cases:,} cases ──")
+        result = bench_size(n_cases, args, real, probes, frames_bgr)
+        report["sizes"][str(n_cases)] = result
+        print(f"  DB load {result['db_load_ms']:.0f} ms, index {result['index_mb']} MB, "
+              f"peak RSS {result['peak_rss_mb']} MB")
+        print(f"  matching   p50 {result['matching']['p50_ms']:.2f} ms  p99 {result['matching']['p99_ms']:.2f} ms")
+        if "p50_ms" in result["scan_frame"]:
+            print(f"  scan_frame p50 {result['scan_frame']['p50_ms']:.1f} ms  "
+                  f"p99 {result['scan_frame']['p99_ms']:.1f} ms")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {REGRESSION_PCT:.0f}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
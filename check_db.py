@@ -2,7 +2,7 @@ from app.models.database import get_connection
 
 conn = get_connection()
 c = conn.cursor()
-c.execute("SELECT id, missing_full_name, image_path, length(embedding) as emb_len FROM cases")
+c.execute("SELECT id, missing_full_name, image_path, length(embedding) as emb_len, embedding_dim, embedding_model FROM cases")
 rows = c.fetchall()
 conn.close()
 
@@ -10,4 +10,4 @@ if not rows:
     print("NO CASES in database.")
 else:
     for r in rows:
-        print(f"  id={r['id']} name={r['missing_full_name']} img={r['image_path']} emb_len={r['emb_len']}")
+        print(f"  id={r['id']} name={r['missing_full_name']} img={r['image_path']} emb_len={r['emb_len']} dim={r['embedding_dim']} model={r['embedding_model']}")
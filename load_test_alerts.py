@@ -0,0 +1,173 @@
+"""
+Load test for the WhatsApp alert path (send_match_alert → outbox → dispatcher → Twilio).
+
+Drives thousands of simulated match alerts through the real whatsapp_service /
+alert_dispatcher code against the local Twilio stand-in (mock_twilio.py), using
+a throwaway SQLite database, and reports delivery throughput, outbox depth and
+enqueue → delivered latency percentiles.
+
+USAGE
+-----
+  python load_test_alerts.py                                  # embedded mock, 2000 alerts
+  python load_test_alerts.py --alerts 5000 --rate 100 --senders 8 --latency-ms 120 --error-rate 0.05
+  python load_test_alerts.py --mock-url http://127.0.0.1:8765  # use an already running mock_twilio.py
+
+--duplicate-rate re-sends alerts for already-alerted cases (a person lingering in
+front of a camera) to measure dedup suppression.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_embedded_mock(args) -> str:
+    import uvicorn
+    from mock_twilio import create_app
+
+    port   = _free_port()
+    app    = create_app(args.latency_ms, args.jitter_ms, args.error_rate,
+                        args.throttle_rate, args.reject_rate, args.seed)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts",         type=int,   default=2000, help="simulated matches to send")
+    parser.add_argument("--producers",      type=int,   default=8,    help="threads calling send_match_alert")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0,  help="fraction repeating an alerted case")
+    parser.add_argument("--senders",        type=int,   default=4,    help="ALERT_SENDERS")
+    parser.add_argument("--rate",           type=float, default=50.0, help="ALERT_RATE_PER_SEC")
+    parser.add_argument("--burst",          type=int,   default=10,   help="ALERT_BURST")
+    parser.add_argument("--retry-delay",    type=float, default=0.5,  help="dispatcher RETRY_BASE_DELAY (s)")
+    parser.add_argument("--timeout",        type=float, default=600,  help="give up draining after N seconds")
+    parser.add_argument("--mock-url",       default=None, help="running mock_twilio.py; default starts one in-process")
+    parser.add_argument("--latency-ms",     type=float, default=80.0)
+    parser.add_argument("--jitter-ms",      type=float, default=40.0)
+    parser.add_argument("--error-rate",     type=float, default=0.0)
+    parser.add_argument("--throttle-rate",  type=float, default=0.0)
+    parser.add_argument("--reject-rate",    type=float, default=0.0)
+    parser.add_argument("--seed",           type=int,   default=0)
+    parser.add_argument("--verbose",        action="store_true", help="keep the per-alert service logs")
+    args = parser.parse_args()
+
+    mock_url = args.mock_url or start_embedded_mock(args)
+
+    # Configure the service before it is imported (config / credentials are read at import time)
+    os.environ.update({
+        "TWILIO_API_BASE":     mock_url,
+        "TWILIO_ACCOUNT_SID":  "ACloadtest",
+        "TWILIO_AUTH_TOKEN":   "loadtest",
+        "ALERT_SENDERS":       str(args.senders),
+        "ALERT_RATE_PER_SEC":  str(args.rate),
+        "ALERT_BURST":         str(args.burst),
+    })
+    import app.models.database as database
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="alert-load-"), "load.db")
+    database.init_db()
+
+    import app.services.alert_dispatcher as dispatcher_module
+    from app.services.alert_dispatcher import alert_dispatcher
+    from app.services.whatsapp_service import send_match_alert, close_client
+    dispatcher_module.RETRY_BASE_DELAY = args.retry_delay
+
+    rng      = random.Random(args.seed)
+    plan     = []
+    for i in range(args.alerts):
+        if plan and rng.random() < args.duplicate_rate:
+            plan.append(rng.choice(plan))
+        else:
+            plan.append((i + 1, f"9{i:09d}"))
+    chunks   = [plan[p::args.producers] for p in range(args.producers)]
+    outcomes = {"queued": 0, "duplicate": 0, "error": 0}
+    lock     = threading.Lock()
+
+    def producer(chunk):
+        for case_id, phone in chunk:
+            try:
+                result = send_match_alert(phone, f"Load Test {case_id}", 0.3, case_id=case_id,
+                                          location="Load Test Camera", officer_no="9000000000")
+                key = "duplicate" if result.get("duplicate") else "queued"
+            except Exception:
+                key = "error"
+            with lock:
+                outcomes[key] += 1
+
+    depths, stop_sampling = [], threading.Event()
+
+    def sampler():
+        while not stop_sampling.wait(0.25):
+            depths.append(alert_dispatcher.depth())
+
+    print(f"Mock Twilio: {mock_url}")
+    print(f"Sending {args.alerts} alerts from {args.producers} producer(s) → "
+          f"{args.senders} sender(s) @ {args.rate:g}/s (burst {args.burst}) …")
+
+    log = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with log:
+        alert_dispatcher.start()
+        threading.Thread(target=sampler, daemon=True).start()
+        started  = time.time()
+        threads  = [threading.Thread(target=producer, args=(chunk,)) for chunk in chunks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        enqueued = time.time()
+        while alert_dispatcher.depth() and time.time() - started < args.timeout:
+            time.sleep(0.1)
+        drained  = time.time()
+        stop_sampling.set()
+        alert_dispatcher.stop()
+        close_client()
+
+    conn = database.get_connection()
+    rows = conn.execute("SELECT status, attempts, created_at, sent_at FROM alert_outbox").fetchall()
+    conn.close()
+    sent      = [r for r in rows if r["status"] == "sent"]
+    failed    = [r for r in rows if r["status"] == "failed"]
+    latencies = np.array([(r["sent_at"] - r["created_at"]) * 1000 for r in sent])
+    retried   = sum(1 for r in sent if r["attempts"] > 1)
+
+    print()
+    print(f"enqueue      : {outcomes['queued']} queued, {outcomes['duplicate']} suppressed as duplicate, "
+          f"{outcomes['error']} error(s) in {enqueued - started:.2f}s "
+          f"({args.alerts / max(enqueued - started, 1e-9):.0f} calls/s)")
+    print(f"delivery     : {len(sent)} sent ({retried} after retry), {len(failed)} failed, "
+          f"{len(rows) - len(sent) - len(failed)} undelivered")
+    if sent:
+        print(f"throughput   : {len(sent) / max(drained - started, 1e-9):.1f} sends/s over {drained - started:.2f}s")
+        print(f"latency (ms) : p50 {np.percentile(latencies, 50):.0f}  p95 {np.percentile(latencies, 95):.0f}  "
+              f"p99 {np.percentile(latencies, 99):.0f}  max {latencies.max():.0f}")
+    if depths:
+        print(f"outbox depth : max {max(depths)}  mean {np.mean(depths):.1f}")
+
+    try:
+        import httpx
+        print(f"mock stats   : {httpx.get(mock_url + '/stats').json()}")
+    except Exception:
+        pass
+
+
+if __name__ == "__main__":
+    main()
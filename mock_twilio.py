@@ -0,0 +1,122 @@
+"""
+Local stand-in for the Twilio Messages REST API (the subset whatsapp_service uses).
+
+Accepts  POST /2010-04-01/Accounts/{AccountSid}/Messages.json  with HTTP basic
+auth and form fields From / To / Body, and answers like Twilio: 201 + a JSON
+message resource with a fresh "SM…" sid. Latency and failures can be injected
+to exercise the alert dispatcher's retry / backoff path.
+
+USAGE
+-----
+  python mock_twilio.py                                  # http://127.0.0.1:8765
+  python mock_twilio.py --latency-ms 150 --jitter-ms 100 --error-rate 0.05 --throttle-rate 0.02
+
+Then point the app at it:
+  TWILIO_API_BASE=http://127.0.0.1:8765  TWILIO_ACCOUNT_SID=ACmock  TWILIO_AUTH_TOKEN=mock
+
+GET /stats returns request / status counters; POST /stats/reset clears them.
+"""
+import argparse
+import asyncio
+import random
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms: float = 0.0, jitter_ms: float = 0.0,
+               error_rate: float = 0.0, throttle_rate: float = 0.0,
+               reject_rate: float = 0.0, seed: int = None) -> FastAPI:
+    """
+    error_rate    : fraction answered 503 (retryable)
+    throttle_rate : fraction answered 429 (retryable)
+    reject_rate   : fraction answered 400 (permanent, e.g. unreachable number)
+    """
+    app   = FastAPI(title="Mock Twilio")
+    rng   = random.Random(seed)
+    stats = Counter()
+    lock  = threading.Lock()
+
+    def _count(key: str):
+        with lock:
+            stats[key] += 1
+
+    @app.post("/2010-04-01/Accounts/{account_sid}/Messages.json")
+    async def create_message(account_sid: str, request: Request):
+        _count("requests")
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+
+        if not request.headers.get("authorization", "").startswith("Basic "):
+            _count("401")
+            return JSONResponse({"code": 20003, "message": "Authenticate", "status": 401}, status_code=401)
+
+        form = await request.form()
+        if not form.get("To") or not form.get("From") or not form.get("Body"):
+            _count("400")
+            return JSONResponse({"code": 21604, "message": "A 'To', 'From' and 'Body' are required",
+                                 "status": 400}, status_code=400)
+
+        roll = rng.random()
+        if roll < throttle_rate:
+            _count("429")
+            return JSONResponse({"code": 20429, "message": "Too Many Requests", "status": 429}, status_code=429)
+        if roll < throttle_rate + error_rate:
+            _count("503")
+            return JSONResponse({"code": 20503, "message": "Service Unavailable", "status": 503}, status_code=503)
+        if roll < throttle_rate + error_rate + reject_rate:
+            _count("400")
+            return JSONResponse({"code": 63016, "message": "Failed to send freeform message", "status": 400},
+                                status_code=400)
+
+        _count("201")
+        return JSONResponse({
+            "sid":          "SM" + uuid.uuid4().hex,
+            "account_sid":  account_sid,
+            "from":         form["From"],
+            "to":           form["To"],
+            "body":         form["Body"],
+            "status":       "queued",
+            "date_created": datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S +0000"),
+        }, status_code=201)
+
+    @app.get("/stats")
+    async def get_stats():
+        with lock:
+            return dict(stats)
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        with lock:
+            stats.clear()
+        return {"ok": True}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host",          default="127.0.0.1")
+    parser.add_argument("--port",          type=int,   default=8765)
+    parser.add_argument("--latency-ms",    type=float, default=0.0)
+    parser.add_argument("--jitter-ms",     type=float, default=0.0)
+    parser.add_argument("--error-rate",    type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--reject-rate",   type=float, default=0.0, help="fraction of permanent 400s")
+    parser.add_argument("--seed",          type=int,   default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(args.latency_ms, args.jitter_ms, args.error_rate,
+                     args.throttle_rate, args.reject_rate, args.seed)
+    print(f"[MockTwilio] Listening on http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,102 +1,270 @@
 """
-Re-generate embeddings for ALL cases using the SAME detector chain as the live
-scan pipeline (retinaface → ssd → opencv → enforce_detection=False).
+Bulk re-embedding of stored case photos.
 
-IMPORTANT: Run this script whenever you change the detector order so that
-           stored embeddings stay consistent with the scan code.
+Only cases whose stored `embedding_version` differs from the current pipeline
+(model / detector / alignment, see face_recognition_service.EMBEDDING_VERSION)
+are re-embedded, so the script is safe to re-run after any config change.
 
-Run: python reembed_cases.py
+  * Images are embedded across a pool of worker processes, EMBED_CHUNK photos
+    per ArcFace pass, detected with the same DETECTOR_CASCADE as live scans
+    and new reports; a photo the cascade finds no face in gets a whole-image
+    (enforce_detection=False) embedding.
+  * Results are written in batched transactions (--commit-every rows each).
+  * Progress is checkpointed after every commit; an interrupted run picks up
+    where it stopped (--restart ignores the checkpoint).
+  * Photos found in the embedding cache (same bytes, same version) skip
+    inference; freshly computed embeddings are added to it (--no-cache: off).
+  * Throughput and ETA are printed as it runs.
+
+The running app does the same automatically after a config change, without
+downtime (app/services/embedding_rollover.py); this script is the offline
+alternative, e.g. for a large DB with more workers. Run it with the app
+stopped: the app loads embeddings into memory at startup.
+
+Run: python reembed_cases.py [--workers N] [--all] [--restart]
 """
-import json
-import sys
 import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app.models.database import get_connection
+from app.models import database
+from app.models.database import get_connection, encode_embedding, init_db
 from app.config import config
+from app.services.face_recognition_service import MODEL_NAME, EMBEDDING_VERSION
+from app.services.embedding_cache import embedding_cache, backfill_image_hashes
+
+EMBED_CHUNK     = 16    # photos per worker task (one batched ArcFace pass)
+COMMIT_EVERY    = 256   # rows written per transaction / checkpoint
+CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(database.DB_PATH)), "reembed_checkpoint.json")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Worker-process side
+# ─────────────────────────────────────────────────────────────────────────────
 
-print("Loading DeepFace (first run may download models, ~1 min)...")
-from deepface import DeepFace
-print("DeepFace loaded.\n")
+def _init_worker():
+    from app.services.embedding_queue import _init_worker as build_models
+    build_models()
 
-# ── MUST match the order in officer.py scan_frame AND case_service.save_case ──
-# opencv = fast and consistent with live scan
-DETECTORS = ["opencv", "ssd", "retinaface"]
 
+def _embed_whole_image(image_path: str) -> list:
+    """No stage of the cascade found a face: embed the whole photo instead."""
+    from app.services.face_recognition_service import detect_faces, embed_faces
+    return embed_faces(detect_faces(image_path, enforce_detection=False)[:1])[0].tolist()
 
-def get_embedding_with_fallback(image_path):
-    """Try detectors in the same priority as the live scan; last resort: enforce_detection=False."""
-    for backend in DETECTORS:
+
+def _embed_chunk(chunk: list) -> list:
+    """[(case_id, image_path)] -> [(case_id, embedding or None, error or None)]"""
+    from app.services.face_recognition_service import get_embeddings_batch
+    results = []
+    batch   = get_embeddings_batch([path for _, path in chunk])
+    for (case_id, path), faces in zip(chunk, batch):
+        if faces:
+            results.append((case_id, faces[0]["embedding"], None))
+            continue
         try:
-            results = DeepFace.represent(
-                img_path=image_path,
-                model_name="ArcFace",
-                detector_backend=backend,
-                align=True,
-                enforce_detection=True,
-            )
-            print(f"    ✅ Succeeded with detector: {backend}")
-            return results[0]["embedding"]
+            results.append((case_id, _embed_whole_image(path), None))
         except Exception as e:
-            print(f"    ⚠️  {backend} failed: {e}")
+            results.append((case_id, None, str(e)))
+    return results
+
 
-    # Final fallback – no detection enforcement (whole-image embedding)
+# ─────────────────────────────────────────────────────────────────────────────
+# Checkpoint
+# ─────────────────────────────────────────────────────────────────────────────
+
+def load_checkpoint(force_all: bool):
+    """Return the saved checkpoint if it belongs to this same kind of run."""
     try:
-        results = DeepFace.represent(
-            img_path=image_path,
-            model_name="ArcFace",
-            detector_backend="opencv",
-            align=True,
-            enforce_detection=False,
-        )
-        print("    ✅ Succeeded with enforce_detection=False (fallback).")
-        return results[0]["embedding"]
-    except Exception as e:
-        raise RuntimeError(f"All detectors failed: {e}")
-
-
-conn = get_connection()
-cursor = conn.cursor()
-
-# Re-embed ALL cases so inconsistent old embeddings are fixed
-cursor.execute("SELECT id, missing_full_name, image_path FROM cases")
-cases = cursor.fetchall()
-
-if not cases:
-    print("No cases found in database.")
-    conn.close()
-    sys.exit(0)
+        with open(CHECKPOINT_PATH) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get("version") != EMBEDDING_VERSION or checkpoint.get("all") != force_all:
+        print(f"[Reembed] Ignoring checkpoint from a different run ({checkpoint.get('version')})")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(checkpoint: dict):
+    tmp = CHECKPOINT_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, CHECKPOINT_PATH)   # atomic: a crash never leaves a torn checkpoint
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Driver
+# ─────────────────────────────────────────────────────────────────────────────
 
-print(f"Found {len(cases)} case(s) to re-embed.\n")
+def select_cases(conn, after_id: int, force_all: bool) -> list:
+    sql, params = "SELECT id, image_path, image_hash FROM cases WHERE id > ?", [after_id]
+    if not force_all:
+        sql += " AND (embedding_version IS NOT ? OR embedding_dim IS NULL)"
+        params.append(EMBEDDING_VERSION)
+    return conn.execute(sql + " ORDER BY id", params).fetchall()
 
-success = 0
-failed  = 0
 
-for case in cases:
-    image_path = os.path.join(config.UPLOAD_FOLDER, case["image_path"])
-    print(f"Case {case['id']}: {case['missing_full_name']}  ({case['image_path']})")
+def _format_eta(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes   = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
 
-    if not os.path.exists(image_path):
-        print(f"    ❌ Image file not found at: {image_path}\n")
-        failed += 1
-        continue
 
+def _chunks(rows: list, size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def run(workers: int, force_all: bool, restart: bool, commit_every: int, chunk_size: int,
+        use_cache: bool = True):
+    init_db()
+    checkpoint = None if restart else load_checkpoint(force_all)
+    if checkpoint:
+        print(f"[Reembed] Resuming after case {checkpoint['last_id']} "
+              f"({checkpoint['done']} done, {len(checkpoint['failed'])} failed so far)")
+    else:
+        checkpoint = {"version": EMBEDDING_VERSION, "all": force_all, "last_id": 0, "done": 0, "failed": []}
+
+    conn = get_connection()
+    rows = select_cases(conn, checkpoint["last_id"], force_all)
+    if not rows:
+        print(f"[Reembed] Nothing to do: every case is at {EMBEDDING_VERSION}")
+        conn.close()
+        if os.path.exists(CHECKPOINT_PATH):
+            os.remove(CHECKPOINT_PATH)
+        return
+
+    # Missing photos fail up front instead of occupying a worker
+    todo, missing = [], []
+    for row in rows:
+        image_path = os.path.join(config.UPLOAD_FOLDER, row["image_path"])
+        (todo if os.path.exists(image_path) else missing).append(dict(row))
+    for case in missing:
+        print(f"[Reembed] Case {case['id']}: image not found at "
+              f"{os.path.join(config.UPLOAD_FOLDER, case['image_path'])}")
+    checkpoint["failed"].extend(case["id"] for case in missing if case["id"] not in checkpoint["failed"])
+
+    total = len(todo)
+    print(f"[Reembed] {total} case(s) to re-embed to {EMBEDDING_VERSION} with {workers} worker(s)")
+
+    pending_writes, pending_embeddings, hashes = [], [], {}
+    processed, failed, cache_hits = 0, 0, 0
+    started = time.time()
+
+    def flush(last_id: int):
+        if pending_writes:
+            conn.executemany(
+                "UPDATE cases SET embedding = ?, embedding_dim = ?, embedding_model = ?, "
+                "embedding_version = ? WHERE id = ?",
+                pending_writes,
+            )
+            if use_cache:
+                embedding_cache.put_many(
+                    [(hashes[case_id], emb) for (_, _, _, _, case_id), emb in zip(pending_writes, pending_embeddings)],
+                    EMBEDDING_VERSION, conn=conn,
+                )
+            conn.commit()
+            checkpoint["done"] += len(pending_writes)
+            pending_embeddings.clear()
+            pending_writes.clear()
+        checkpoint["last_id"] = last_id
+        save_checkpoint(checkpoint)
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),   # TensorFlow is not fork-safe
+        initializer=_init_worker,
+    )
+    in_flight, chunks = deque(), _chunks(todo, chunk_size)
     try:
-        embedding      = get_embedding_with_fallback(image_path)
-        embedding_json = json.dumps(embedding)
-
-        update_cursor = conn.cursor()
-        update_cursor.execute(
-            "UPDATE cases SET embedding = ? WHERE id = ?",
-            (embedding_json, case["id"])
-        )
-        conn.commit()
-        print(f"    💾 Saved embedding ({len(embedding)} dims).\n")
-        success += 1
-    except Exception as e:
-        print(f"    ❌ All detectors failed: {e}\n")
-        failed += 1
-
-conn.close()
-print(f"Done. ✅ {success} succeeded  ❌ {failed} failed.")
+        while True:
+            # Keep every worker busy without queueing the whole table in the pool
+            while len(in_flight) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                # Unchanged photos already embedded at this version skip inference
+                backfill_image_hashes(chunk)
+                hashes.update((case["id"], case["image_hash"]) for case in chunk)
+                cached = embedding_cache.get_many([case["image_hash"] for case in chunk],
+                                                  EMBEDDING_VERSION) if use_cache else {}
+                misses = [
+                    (case["id"], os.path.join(config.UPLOAD_FOLDER, case["image_path"]))
+                    for case in chunk if case["image_hash"] not in cached
+                ]
+                future = executor.submit(_embed_chunk, misses) if misses else None
+                in_flight.append((chunk, cached, future))
+            if not in_flight:
+                break
+
+            # Results are consumed in submission order so last_id only moves forward
+            chunk, cached, future = in_flight.popleft()
+            computed = {case_id: (emb, error) for case_id, emb, error in (future.result() if future else [])}
+            cache_hits += len(chunk) - len(computed)
+            for case in chunk:
+                case_id = case["id"]
+                if case_id in computed:
+                    embedding, error = computed[case_id]
+                else:
+                    embedding, error = cached[case["image_hash"]].tolist(), None
+                processed += 1
+                if embedding is None:
+                    failed += 1
+                    checkpoint["failed"].append(case_id)
+                    print(f"[Reembed] Case {case_id}: could not embed: {error}")
+                else:
+                    pending_writes.append(
+                        (encode_embedding(embedding), len(embedding), MODEL_NAME, EMBEDDING_VERSION, case_id)
+                    )
+                    pending_embeddings.append(embedding)
+                if len(pending_writes) >= commit_every:
+                    flush(case_id)
+            flush(case_id)
+
+            elapsed = time.time() - started
+            rate    = processed / elapsed if elapsed else 0.0
+            eta     = (total - processed) / rate if rate else 0.0
+            print(f"[Reembed] {processed}/{total} ({processed / total:.1%})  "
+                  f"{rate:.1f} img/s  ETA {_format_eta(eta)}  cached {cache_hits}  failed {failed}")
+    except KeyboardInterrupt:
+        print("[Reembed] Interrupted; re-run to resume from the checkpoint")
+        executor.shutdown(wait=False, cancel_futures=True)
+        conn.close()
+        sys.exit(130)
+
+    executor.shutdown()
+    conn.close()
+    if os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+
+    elapsed = time.time() - started
+    print(f"Done in {_format_eta(elapsed)} ({processed / elapsed if elapsed else 0:.1f} img/s). "
+          f"✅ {checkpoint['done']} re-embedded  ❌ {len(checkpoint['failed'])} failed.")
+    if checkpoint["failed"]:
+        print(f"   Failed case ids: {checkpoint['failed']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed cases whose embedding version is out of date.")
+    parser.add_argument("--workers", type=int, default=config.EMBEDDING_WORKERS,
+                        help="embedding worker processes (default: EMBEDDING_WORKERS)")
+    parser.add_argument("--all", action="store_true", help="re-embed every case, even ones already current")
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    parser.add_argument("--commit-every", type=int, default=COMMIT_EVERY, help="rows per write transaction")
+    parser.add_argument("--chunk", type=int, default=EMBED_CHUNK, help="photos per worker task")
+    parser.add_argument("--no-cache", action="store_true", help="recompute even photos in the embedding cache")
+    args = parser.parse_args()
+    run(max(1, args.workers), args.all, args.restart, max(1, args.commit_every), max(1, args.chunk),
+        use_cache=not args.no_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -25,13 +25,16 @@ import numpy as np
 
 # ── make app/ importable from the project root ──────────────────────────────
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from services.face_recognition_service import (
     get_embedding,
     cosine_distance,
     MATCH_THRESHOLD,
 )
-from services.whatsapp_service import send_match_alert
+from app.services.whatsapp_service import send_match_alert
+from app.services.alert_dispatcher import alert_dispatcher
+from app.models.database import init_db
 from deepface import DeepFace
 
 # Fast detector for live webcam frames (ssd is ~10x faster than retinaface)
@@ -275,6 +278,8 @@ def main():
         complainant_phone=args.complainant,
     )
     if args.complainant:
+        init_db()
+        alert_dispatcher.start()   # alerts go through the outbox like in the web app
         print(f"[INFO] WhatsApp alerts will be sent to {args.complainant} on match.\n")
     worker.start()
 
@@ -293,6 +298,7 @@ def main():
             break
 
     worker.stop()
+    alert_dispatcher.stop()
     cap.release()
     cv2.destroyAllWindows()
     print("\n[INFO] Done.")
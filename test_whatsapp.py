@@ -5,8 +5,14 @@ import os
 sys.path.insert(0, os.getcwd())
 
 try:
+    from app.models.database import init_db
     from app.services.whatsapp_service import send_match_alert
+    from app.services.alert_dispatcher import alert_dispatcher
     import random
+    import time
+
+    init_db()
+    alert_dispatcher.start()
 
     print("--- Starting WhatsApp Test ---")
     # Using one of the numbers from the DB
@@ -25,10 +31,17 @@ try:
         officer_no=officer_no
     )
 
-    if result.get("success"):
-        print(f"SUCCESS! Message SID: {result.get('sid')}")
+    if result.get("duplicate"):
+        print("SKIPPED! An alert for this case was sent recently (dedup window)")
+    elif result.get("success"):
+        # Delivery happens on the dispatcher's sender threads; wait for the outbox to drain
+        deadline = time.time() + 30
+        while alert_dispatcher.depth() and time.time() < deadline:
+            time.sleep(0.5)
+        print(f"Outbox drained (alert #{result.get('queued')}) — see [AlertDispatcher] log above for the SID")
     else:
         print(f"FAILED! Error: {result.get('error')}")
+    alert_dispatcher.stop()
 
 except Exception as e:
     print(f"EXCEPTION: {e}")